@@ -8,7 +8,8 @@ a = Analysis(
     ['src/main.py'],
     pathex=['.'],
     datas=[],
-    hiddenimports=[],
+    # gunicorn loads worker and logger classes by name
+    hiddenimports=['gunicorn.glogging', 'gunicorn.workers.gthread'],
     hookspath=[],
     runtime_hooks=[],
     excludes=[],
@@ -11,7 +11,8 @@ def find_version():
 dependencies = [
     "itsdangerous==2.1.2",
     "Flask==2.3.3",
-    "psutil==5.9.4",
+    "aiohttp==3.9.5",
+    "gunicorn==21.2.0",
     "docker==6.1.2",
     "sh==2.0.6",
     "python-crontab==2.7.1"
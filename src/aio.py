@@ -0,0 +1,252 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+
+from aiohttp import web
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+from .app import (
+    app as flask_app,
+    FORWARDED_ENVIRON_KEY,
+    HOST,
+    PORT,
+    prepare
+)
+from .config import (
+    ASYNC_EXECUTOR_WORKERS,
+    LIVENESS_ROUTE,
+    REQUEST_DEADLINE,
+    SOCKET_PATH,
+    TCP_ENABLED
+)
+from .core import (
+    DEFAULT_RETRY_NUMBER,
+    CommandError,
+    LvmPyError,
+    compose_exponantional_timeouts,
+    describe_volumes,
+    driver_volumes,
+    path as volume_path,
+    volume_cache
+)
+from .locks import generation
+from .metrics import REQUEST_DURATION
+from .report import LV_FIELDS, parse_volumes, report_cmd
+from .retry import UNKNOWN, classify, deadline, next_delay
+from .trace import tracer
+from .watchdog import watchdog
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=ASYNC_EXECUTOR_WORKERS,
+    thread_name_prefix='lvmpy-executor'
+)
+
+
+async def run_cmd_async(cmd, retries=DEFAULT_RETRY_NUMBER) -> str:
+    err, error_class = None, UNKNOWN
+    timeouts = compose_exponantional_timeouts(retries)
+    lines = ' '.join(cmd)
+    for attempt, timeout in enumerate(timeouts):
+        logger.info(f'Command [{lines}] attempt {attempt}')
+        started_at, start = time.time(), time.monotonic()
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await proc.communicate()
+        tracer.record(
+            cmd, started_at, time.monotonic() - start, proc.returncode,
+            stderr_size=len(stderr), attempt=attempt
+        )
+        if proc.returncode == 0:
+            logger.info(f'Command [{lines}] success')
+            return stdout.decode('utf-8')
+        err = stderr.decode('utf-8')
+        out = stdout.decode('utf-8')
+        error_class = classify(err, os.path.basename(cmd[0]))
+        delay = next_delay(error_class, attempt, timeouts)
+        logger.error(
+            f'Command [{lines}] attempt {attempt} failed ({error_class}) '
+            f'with {err}, out: {out}. ' +
+            (f'Sleeping for {delay:.2f}s' if delay is not None else 'Giving up')
+        )
+        if delay is None:
+            break
+        await asyncio.sleep(delay)
+    raise CommandError(f'Command [{lines}] failed, error: {err}', error_class)
+
+
+async def cached_volumes(force: bool = False) -> Dict[str, dict]:
+    volumes = None if force else volume_cache.cached()
+    if volumes is None:
+        version, observed_generation = volume_cache.version, generation.current()
+        stdout = await run_cmd_async(
+            report_cmd('lvs', LV_FIELDS, f'vg_name={volume_cache.group}')
+        )
+        volumes = describe_volumes(driver_volumes(parse_volumes(stdout)))
+        volume_cache.replace(volumes, version, observed_generation)
+    return volumes
+
+
+async def get_volume(name: str) -> Optional[str]:
+    if name in await cached_volumes():
+        return name
+    # volume could be created bypassing the driver
+    if name in await cached_volumes(force=True):
+        return name
+    return None
+
+
+def response(data: dict, code: int = 200) -> web.Response:
+    return web.Response(
+        text=json.dumps(data), status=code, content_type='application/json'
+    )
+
+
+def ok(out_data: dict = None) -> web.Response:
+    return response({**(out_data or {}), 'Err': ''})
+
+
+def error(err, code: int = 400) -> web.Response:
+    return response({'Err': err}, code)
+
+
+async def request_data(request: web.Request) -> dict:
+    body = await request.read()
+    if not body:
+        return {}
+    return json.loads(body)
+
+
+@web.middleware
+async def log_elapsed(request, handler):
+    start_time = time.time()
+    status = 500
+    try:
+        with deadline(REQUEST_DEADLINE):
+            res = await handler(request)
+        status = res.status
+        return res
+    except LvmPyError as e:
+        logger.error(f'Request failed with 500 code, err=[{e}]')
+        watchdog.trigger()
+        return error(err='InternalServerError', code=500)
+    finally:
+        elapsed = time.time() - start_time
+        route = 'unmatched' if status == 404 else request.path
+        REQUEST_DURATION.observe(elapsed, route=route)
+        logger.info(f'Request elapsed time: {round(elapsed, 2)}s')
+
+
+async def live(request):
+    # answered by the event loop itself, so a blocked loop fails the probe
+    return ok()
+
+
+async def activate(request):
+    return ok({'Implements': ['VolumeDriver']})
+
+
+async def capabilities(request):
+    return ok({'Capabilities': {'Scope': 'global'}})
+
+
+async def volumes_list(request):
+    data = await request_data(request)
+    volumes = await cached_volumes(force=bool(data.get('Refresh')))
+    volumes_data = [{'Name': volume, 'Status': {}} for volume in volumes]
+    return ok({'Volumes': volumes_data})
+
+
+async def get(request):
+    data = await request_data(request)
+    name = await get_volume(data['Name'])
+    if name is None:
+        return error('No such volume')
+    return ok({'Volume': {'Name': name, 'Status': {}}})
+
+
+async def path(request):
+    data = await request_data(request)
+    mountpoint = volume_path(data['Name'])
+    return ok({'Mountpoint': mountpoint})
+
+
+async def forward(request):
+    """ Passes the request to the flask application in the executor.
+
+    Mutating operations keep their single implementation in core and
+    run in executor threads so they never block the event loop.
+    """
+    environ = EnvironBuilder(
+        path=request.path,
+        method=request.method,
+        query_string=request.query_string,
+        headers=list(request.headers.items()),
+        data=await request.read()
+    ).get_environ()
+    # latency is already recorded by the aiohttp middleware
+    environ[FORWARDED_ENVIRON_KEY] = True
+    loop = asyncio.get_running_loop()
+    app_iter, status, headers = await loop.run_in_executor(
+        executor, partial(run_wsgi_app, flask_app, environ, buffered=True)
+    )
+    return web.Response(
+        body=b''.join(app_iter),
+        status=int(status.split()[0]),
+        content_type=headers.get('Content-Type', 'application/json').split(';')[0]
+    )
+
+
+def create_app() -> web.Application:
+    aio_app = web.Application(middlewares=[log_elapsed])
+    aio_app.router.add_get(LIVENESS_ROUTE, live)
+    aio_app.router.add_post('/Plugin.Activate', activate)
+    aio_app.router.add_post('/VolumeDriver.Capabilities', capabilities)
+    aio_app.router.add_post('/VolumeDriver.List', volumes_list)
+    aio_app.router.add_post('/VolumeDriver.Get', get)
+    aio_app.router.add_post('/VolumeDriver.Path', path)
+    aio_app.router.add_route('*', '/{tail:.*}', forward)
+    return aio_app
+
+
+def run():
+    prepare()
+    if SOCKET_PATH is None:
+        web.run_app(create_app(), host=HOST, port=PORT)
+        return
+
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    if TCP_ENABLED:
+        web.run_app(create_app(), host=HOST, port=PORT, path=SOCKET_PATH)
+    else:
+        web.run_app(create_app(), path=SOCKET_PATH)
@@ -19,13 +19,27 @@
 
 import json
 import logging
+import os
+import signal
+import threading
 import time
+from typing import Optional
 
 from flask import Flask, Response, g, request
 from werkzeug.exceptions import InternalServerError
-
-from .config import PHYSICAL_VOLUME
+from werkzeug.serving import make_server
+
+from .config import (
+    LIVENESS_ROUTE,
+    PHYSICAL_VOLUME,
+    READINESS_MAX_STATE_AGE,
+    READINESS_ROUTE,
+    REQUEST_DEADLINE,
+    SOCKET_PATH,
+    TCP_ENABLED
+)
 from .core import (
+    batch as batch_volumes,
     ensure_volume_group,
     create as create_volume,
     remove as remove_volume,
@@ -34,10 +48,31 @@ from .core import (
     path as volume_path,
     get as get_volume,
     get_block_device_size,
+    volume_collector,
+    resize_many as resize_volumes,
+    volume_cache,
     volumes as list_volumes,
-    LvmPyError
+    LvmPyError,
+    VolumeOperation
 )
+from .locks import locks
 from .log import init_logging
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REQUEST_DURATION
+from .metrics import render as render_metrics
+from .mkfs import DEFAULT_FORMAT_OPTIONS, parse_format_options
+from .pool import warm_pool
+from .retry import clear_deadline, set_deadline
+from .snapshots import (
+    SUBVOLUME,
+    create_from_snapshot,
+    create_snapshot,
+    list_snapshots,
+    remove_snapshot
+)
+from .supervisor import supervisor
+from .trace import tracer
+from .watchdog import watchdog
+from .workers import QueueFullError, fs_workers
 
 
 init_logging()
@@ -50,6 +85,7 @@ app = Flask(__name__)
 HOST = '127.0.0.1'
 PORT = 7373
 DEFAULT_SIZE = '256m'
+FORWARDED_ENVIRON_KEY = 'lvmpy.forwarded'
 
 
 def response(data: dict, code: int) -> Response:
@@ -70,23 +106,31 @@ def error(err, code: int = 400):
 @app.before_request
 def save_time():
     g.start_time = time.time()
-
-
-@app.before_request
-def ensure_vg():
-    ensure_volume_group()
+    set_deadline(REQUEST_DEADLINE)
 
 
 @app.errorhandler(InternalServerError)
 def handle_500(e):
     logger.error(f'Request failed with 500 code, err=[{e}]')
+    if isinstance(e.original_exception, LvmPyError):
+        watchdog.trigger()
     return error(err='InternalServerError', code=500)
 
 
+@app.errorhandler(QueueFullError)
+def handle_queue_full(e):
+    logger.warning(f'Request rejected, err=[{e}]')
+    return error(err='Too many volume operations in progress', code=503)
+
+
 @app.teardown_request
 def log_elapsed(response):
-    elapsed = round(time.time() - g.start_time, 2)
-    logger.info(f'Request elapsed time: {elapsed}s')
+    elapsed = time.time() - g.start_time
+    if not request.environ.get(FORWARDED_ENVIRON_KEY):
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_DURATION.observe(elapsed, route=route)
+    logger.info(f'Request elapsed time: {round(elapsed, 2)}s')
+    clear_deadline()
     return response
 
 
@@ -95,6 +139,74 @@ def index():
     return ok()
 
 
+def age(timestamp: Optional[float], now: float) -> Optional[float]:
+    return None if timestamp is None else round(now - timestamp, 3)
+
+
+def readiness() -> dict:
+    """ Summarizes cached service state, lvm is never queried """
+    now = time.time()
+    state_age = age(watchdog.last_check, now)
+    problems = []
+    if watchdog.last_error is not None:
+        problems.append(f'Volume group check failed: {watchdog.last_error}')
+    if state_age is not None and state_age > READINESS_MAX_STATE_AGE:
+        problems.append(f'Volume group state is {state_age}s old')
+    if fs_workers.queued >= fs_workers.queue_size:
+        problems.append('Filesystem operations queue is full')
+    cache_age = volume_cache.age
+    return {
+        'Ready': not problems,
+        'Problems': problems,
+        'StateAge': state_age,
+        'CacheAge': None if cache_age is None else round(cache_age, 3),
+        'LockedVolumes': len(locks.active()),
+        'QueuedOperations': fs_workers.queued,
+        'ActiveOperations': fs_workers.active,
+        'LastLvmSuccessAge': age(tracer.last_lvm_success, now),
+        'LastLvmFailureAge': age(tracer.last_lvm_failure, now)
+    }
+
+
+@app.route(LIVENESS_ROUTE)
+def live():
+    return ok()
+
+
+@app.route(READINESS_ROUTE)
+def ready():
+    state = readiness()
+    if state['Ready']:
+        return ok(state)
+    return response({**state, 'Err': '; '.join(state['Problems'])}, 503)
+
+
+@app.route('/metrics')
+def metrics():
+    """ Prometheus metrics of the serving process.
+
+    Not supported with SERVER_MODE=gunicorn: counters and histograms live
+    in each worker and a scrape reaches a random one, so series jump
+    between workers and counters seem to reset.
+    """
+    return Response(
+        response=render_metrics(volume_collector),
+        status=200,
+        content_type=METRICS_CONTENT_TYPE
+    )
+
+
+@app.route('/debug/commands')
+def debug_commands():
+    slow = request.args.get('slow') == 'true'
+    limit = request.args.get('limit', type=int)
+    traces = tracer.traces(slow=slow, limit=limit)
+    return ok({
+        'SlowThreshold': tracer.slow_threshold,
+        'Commands': [trace.as_dict() for trace in traces]
+    })
+
+
 @app.route('/physical-volume-size')
 def physical_volume_size():
     data = request.get_json(force=True)
@@ -122,9 +234,29 @@ def create():
     if options is None:
         options = {}
     size_str = options.get('size') or DEFAULT_SIZE
+    thin = options.get('thin') == 'true'
     logger.info(f'Create volume options={options}, size_str={size_str}')
-
-    create_volume(name, size_str)
+    from_snapshot = options.get('from_snapshot')
+    if from_snapshot:
+        volume, _, snapshot = from_snapshot.partition('/')
+        if not volume or not snapshot:
+            return error(f'from_snapshot should be <volume>/<snapshot>, '
+                         f'got {from_snapshot}')
+        try:
+            create_from_snapshot(name, volume, snapshot)
+        except LvmPyError as e:
+            logger.error(f'Creation from snapshot failed with {e}')
+            return error(str(e))
+        return ok()
+    try:
+        format_options = parse_format_options(options)
+    except ValueError as e:
+        return error(str(e))
+
+    # warm pool volumes are formatted with default options
+    if thin or format_options != DEFAULT_FORMAT_OPTIONS or \
+            not warm_pool.take(name, size_str):
+        create_volume(name, size_str, thin=thin, format_options=format_options)
     return ok()
 
 
@@ -153,6 +285,100 @@ def unmount():
     return ok()
 
 
+@app.route('/VolumeDriver.Resize', methods=['POST'])
+def resize():
+    data = request.get_json(force=True)
+    items = data.get('Volumes') or [data]
+    sizes = {item['Name']: item['Size'] for item in items}
+    logger.info(f'Resize volumes {sizes}')
+    try:
+        resize_volumes(sizes)
+    except LvmPyError as e:
+        logger.error(f'Resize failed with {e}')
+        return error(str(e))
+    return ok()
+
+
+@app.route('/VolumeDriver.Batch', methods=['POST'])
+def batch():
+    data = request.get_json(force=True)
+    operations = []
+    for item in data.get('Operations') or []:
+        options = item.get('Opts') or {}
+        try:
+            format_options = parse_format_options(options)
+        except ValueError as e:
+            return error(f'{item["Name"]}: {e}')
+        operations.append(VolumeOperation(
+            op=item.get('Op', ''),
+            name=item['Name'],
+            size=options.get('size'),
+            thin=options.get('thin') == 'true',
+            is_schain=item.get('is_schain', True),
+            format_options=format_options
+        ))
+    logger.info(f'Batch of {len(operations)} operations')
+
+    results = batch_volumes(
+        operations, take=warm_pool.take if warm_pool.enabled else None
+    )
+
+    return ok({'Results': [
+        {
+            'Op': result.op,
+            'Name': result.name,
+            'Mountpoint': result.mountpoint,
+            'Err': result.error or ''
+        }
+        for result in results
+    ]})
+
+
+@app.route('/Snapshot.Create', methods=['POST'])
+def snapshot_create():
+    data = request.get_json(force=True)
+    try:
+        create_snapshot(
+            data['Name'],
+            data['Snapshot'],
+            snapshot_type=data.get('Type', SUBVOLUME),
+            readonly=data.get('ReadOnly', False)
+        )
+    except LvmPyError as e:
+        logger.error(f'Snapshot creation failed with {e}')
+        return error(str(e))
+    return ok()
+
+
+@app.route('/Snapshot.List', methods=['POST'])
+def snapshot_list():
+    data = request.get_json(force=True)
+    try:
+        snapshots = list_snapshots(data['Name'])
+    except LvmPyError as e:
+        logger.error(f'Snapshot listing failed with {e}')
+        return error(str(e))
+    return ok({'Snapshots': [
+        {'Name': snapshot.name, 'Type': snapshot.type}
+        for snapshot in snapshots
+    ]})
+
+
+@app.route('/Snapshot.Remove', methods=['POST'])
+def snapshot_remove():
+    data = request.get_json(force=True)
+    try:
+        remove_snapshot(
+            data['Name'],
+            data['Snapshot'],
+            snapshot_type=data.get('Type', SUBVOLUME)
+        )
+    except LvmPyError as e:
+        logger.error(f'Snapshot removal failed with {e}')
+        return error(str(e))
+    return ok()
+
+
 @app.route('/VolumeDriver.Path', methods=['POST'])
 def path():
     data = request.get_json(force=True)
@@ -166,7 +392,7 @@ def path():
 def get():
     data = request.get_json(force=True)
     name = data['Name']
-    name = get_volume(name)
+    name = get_volume(name, cached=True)
     if name is None:
         return error('No such volume')
 
@@ -181,7 +407,10 @@ def get():
 
 @app.route('/VolumeDriver.List', methods=['POST'])
 def volumes_list():
-    volumes = list_volumes()
+    data = request.get_json(force=True, silent=True) or {}
+    if data.get('Refresh'):
+        volume_cache.refresh()
+    volumes = list_volumes(cached=True)
     volumes_data = [{'Name': volume, 'Status': {}} for volume in volumes]
     data = {'Volumes': volumes_data, 'Err': ''}
     return ok(out_data=data)
@@ -196,5 +425,46 @@ def capabilites():
     })
 
 
+def verify_volume_group():
+    logger.info('Verifying volume group before serving requests')
+    ensure_volume_group()
+
+
+def start_watchdog(handle_signal: bool = True):
+    watchdog.start()
+    if handle_signal:
+        signal.signal(
+            signal.SIGUSR1, lambda signum, frame: watchdog.trigger()
+        )
+
+
+def start_warm_pool():
+    if warm_pool.enabled:
+        warm_pool.start()
+
+
+def start_supervisor():
+    supervisor.start()
+
+
+def prepare():
+    verify_volume_group()
+    start_watchdog()
+    start_warm_pool()
+    start_supervisor()
+
+
 def run():
-    app.run(host=HOST, port=PORT)
+    prepare()
+    if SOCKET_PATH is None:
+        app.run(host=HOST, port=PORT)
+        return
+
+    if TCP_ENABLED:
+        tcp_server = make_server(HOST, PORT, app, threaded=True)
+        threading.Thread(
+            target=tcp_server.serve_forever, name='tcp-server', daemon=True
+        ).start()
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    logger.info('Listening on unix socket %s', SOCKET_PATH)
+    make_server(f'unix://{SOCKET_PATH}', 0, app, threaded=True).serve_forever()
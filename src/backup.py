@@ -0,0 +1,280 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import argparse
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import BinaryIO, List, Optional
+
+from .core import (
+    LvmPyError,
+    create,
+    get,
+    mounted,
+    run_cmd,
+    volume_device
+)
+from .locks import locks
+from .log import init_logging
+from .mounts import mount_table
+from .snapshots import (
+    SNAPSHOTS_DIR,
+    create_subvolume_snapshot,
+    remove_subvolume_snapshot
+)
+from .trace import tracer
+
+logger = logging.getLogger(__name__)
+
+
+BACKUP_PREFIX = 'backup-'
+RECEIVED_RE = re.compile(r'^At (?:subvol|snapshot) (\S+)$', re.MULTILINE)
+COMPRESS_CMD = ['zstd', '-q', '-c', '-T0']
+DECOMPRESS_CMD = ['zstd', '-q', '-d', '-c']
+
+
+def run_pipeline(
+    commands: List[List[str]],
+    stdin: Optional[BinaryIO] = None,
+    stdout: Optional[BinaryIO] = None
+) -> List[str]:
+    """ Connects commands with os pipes and waits for all of them.
+
+    The stream never passes through python, so memory use does not
+    depend on its size. Returns stderr output of every command.
+    """
+    procs, errors = [], []
+    previous = stdin
+    started_at, start = time.time(), time.monotonic()
+    try:
+        for i, cmd in enumerate(commands):
+            last = i == len(commands) - 1
+            error_file = tempfile.TemporaryFile()
+            errors.append(error_file)
+            proc = subprocess.Popen(
+                cmd,
+                stdin=previous,
+                stdout=stdout if last else subprocess.PIPE,
+                stderr=error_file
+            )
+            if i > 0:
+                # only the next command should hold the pipe
+                previous.close()
+            previous = proc.stdout
+            procs.append(proc)
+    except OSError as e:
+        for proc in procs:
+            proc.kill()
+        raise LvmPyError(f'Starting pipeline failed: {e}')
+
+    outputs = []
+    for cmd, proc, error_file in zip(commands, procs, errors):
+        proc.wait()
+        error_file.seek(0)
+        stderr = error_file.read()
+        error_file.close()
+        tracer.record(
+            cmd, started_at, time.monotonic() - start, proc.returncode,
+            stderr_size=len(stderr)
+        )
+        outputs.append(stderr.decode('utf-8'))
+    for cmd, proc, stderr in zip(commands, procs, outputs):
+        if proc.returncode != 0:
+            raise LvmPyError(f'Command [{" ".join(cmd)}] failed, error: {stderr}')
+    return outputs
+
+
+def open_stream(path: str, mode: str) -> BinaryIO:
+    if path == '-':
+        stream = sys.stdout if 'w' in mode else sys.stdin
+        return stream.buffer
+    return open(path, mode)
+
+
+def backup_snapshot_name() -> str:
+    return f'{BACKUP_PREFIX}{time.strftime("%Y%m%dT%H%M%S", time.gmtime())}'
+
+
+def backup(
+    volume: str,
+    output: str,
+    parent: Optional[str] = None,
+    snapshot: Optional[str] = None,
+    compress: bool = True
+) -> str:
+    """ Streams the volume to output using btrfs send.
+
+    A read-only snapshot is taken in the volume and kept as a parent for
+    the next incremental backup. With parent only the extents changed
+    since the parent snapshot are sent. If sending fails the snapshot and
+    the partial output file are removed, so an incomplete backup never
+    becomes a parent. Returns the snapshot name.
+    """
+    snapshot = snapshot or backup_snapshot_name()
+    with mounted(volume) as mountpoint:
+        create_subvolume_snapshot(volume, snapshot, readonly=True)
+        snapshots_dir = os.path.join(mountpoint, SNAPSHOTS_DIR)
+        send_cmd = ['btrfs', 'send', '-q']
+        if parent:
+            send_cmd.extend(['-p', os.path.join(snapshots_dir, parent)])
+        send_cmd.append(os.path.join(snapshots_dir, snapshot))
+        commands = [send_cmd] + ([COMPRESS_CMD] if compress else [])
+        logger.info(f'Backing up {volume} as {snapshot}, parent: {parent}')
+        stream = open_stream(output, 'wb')
+        try:
+            run_pipeline(commands, stdout=stream)
+        except Exception:
+            logger.error(f'Backup of {volume} failed, removing {snapshot}')
+            if output != '-':
+                stream.close()
+                if os.path.isfile(output):
+                    os.remove(output)
+            remove_subvolume_snapshot(volume, snapshot)
+            raise
+        finally:
+            if output != '-':
+                stream.close()
+    return snapshot
+
+
+def prune_backups(volume: str, keep: List[str]) -> None:
+    """ Removes backup snapshots of the volume except the kept ones """
+    with locks.volume(volume), mounted(volume) as mountpoint:
+        snapshots_dir = os.path.join(mountpoint, SNAPSHOTS_DIR)
+        for name in sorted(os.listdir(snapshots_dir)):
+            if name.startswith(BACKUP_PREFIX) and name not in keep:
+                logger.info(f'Removing backup snapshot {name} of {volume}')
+                run_cmd(['btrfs', 'subvolume', 'delete',
+                         os.path.join(snapshots_dir, name)], retries=1)
+
+
+def replace_contents(mountpoint: str, source: str) -> None:
+    """ Replaces volume files with the received snapshot using reflinks """
+    for name in os.listdir(mountpoint):
+        if name == SNAPSHOTS_DIR:
+            continue
+        path = os.path.join(mountpoint, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    run_cmd([
+        'cp', '-a', '--reflink=always', f'{source}/.', f'{mountpoint}/'
+    ], retries=1)
+
+
+def restore(
+    volume: str,
+    source: str,
+    size: Optional[str] = None,
+    compress: bool = True
+) -> str:
+    """ Receives a backup stream into the volume.
+
+    The volume is created when it does not exist. The received snapshot
+    is kept in .snapshots as a parent for the following incremental
+    restores and volume files are replaced by its reflinked copy.
+    Returns the received snapshot name.
+    """
+    if get(volume) is None:
+        if size is None:
+            raise LvmPyError(f'Volume {volume} does not exist, size is required')
+        create(volume, size)
+    if mount_table.mounts(volume_device(volume)):
+        raise LvmPyError(f'Volume {volume} is mounted, unmount it before restore')
+
+    with locks.volume(volume), mounted(volume) as mountpoint:
+        snapshots_dir = os.path.join(mountpoint, SNAPSHOTS_DIR)
+        os.makedirs(snapshots_dir, exist_ok=True)
+        commands = [DECOMPRESS_CMD] if compress else []
+        commands.append(['btrfs', 'receive', snapshots_dir])
+        logger.info(f'Restoring {volume} from {source}')
+        stream = open_stream(source, 'rb')
+        try:
+            outputs = run_pipeline(commands, stdin=stream)
+        finally:
+            if source != '-':
+                stream.close()
+        received = RECEIVED_RE.findall(outputs[-1])
+        if not received:
+            raise LvmPyError(f'Cannot find received snapshot in {outputs[-1]}')
+        snapshot = received[-1]
+        replace_contents(mountpoint, os.path.join(snapshots_dir, snapshot))
+    return snapshot
+
+
+def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='lvmpy-backup',
+        description='Incremental volume backups with btrfs send/receive'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    backup_parser = subparsers.add_parser('backup', help='Stream volume backup')
+    backup_parser.add_argument('volume')
+    backup_parser.add_argument('output', help='File path or - for stdout')
+    backup_parser.add_argument('--parent', help='Snapshot of previous backup')
+    backup_parser.add_argument('--snapshot', help='Name of the new snapshot')
+    backup_parser.add_argument(
+        '--prune', action='store_true',
+        help='Remove backup snapshots except the new one'
+    )
+    backup_parser.add_argument('--no-compress', action='store_true')
+
+    restore_parser = subparsers.add_parser('restore', help='Receive backup')
+    restore_parser.add_argument('volume')
+    restore_parser.add_argument('input', help='File path or - for stdin')
+    restore_parser.add_argument('--size', help='Size of the volume to create')
+    restore_parser.add_argument('--no-compress', action='store_true')
+    return parser.parse_args(args)
+
+
+def main():
+    init_logging()
+    args = parse_args()
+    try:
+        if args.command == 'backup':
+            snapshot = backup(
+                args.volume, args.output,
+                parent=args.parent,
+                snapshot=args.snapshot,
+                compress=not args.no_compress
+            )
+            if args.prune:
+                prune_backups(args.volume, keep=[snapshot])
+        else:
+            snapshot = restore(
+                args.volume, args.input,
+                size=args.size,
+                compress=not args.no_compress
+            )
+    except LvmPyError as err:
+        print(f'{args.command.capitalize()} failed with error: {err}', file=sys.stderr)
+        exit(2)
+    print(f'{args.command.capitalize()} finished, snapshot: {snapshot}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,50 @@ SHARED_VOLUMES = ('shared-space',)
 
 FILESTORAGE_MAPPING = os.getenv('FILESTORAGE_MAPPING', '/var/lib/skale/filestorage')
 
+VOLUMES_CACHE_TTL = int(os.getenv('VOLUMES_CACHE_TTL', 60))
+VG_WATCHDOG_INTERVAL = int(os.getenv('VG_WATCHDOG_INTERVAL', 60))
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'flask')
+ASYNC_EXECUTOR_WORKERS = int(os.getenv('ASYNC_EXECUTOR_WORKERS', 16))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 4))
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', 4))
+SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', 300))
+MULTIPROCESS = SERVER_MODE == 'gunicorn'
+
+LOCK_DIR = os.getenv('LVMPY_LOCK_DIR', '/run/docker-lvmpy')
+GENERATION_PATH = os.path.join(LOCK_DIR, 'generation')
+
+# always | on-failure | off - when to look for processes using the volume
+UNMOUNT_DIAGNOSTICS = os.getenv('UNMOUNT_DIAGNOSTICS', 'on-failure')
+
+# Thin provisioning is available when pool size is set (e.g. 90%FREE or 500g)
+THIN_POOL_NAME = os.getenv('THIN_POOL_NAME', 'lvmpy-thinpool')
+THIN_POOL_SIZE = os.getenv('THIN_POOL_SIZE')
+THIN_POOL_AUTOEXTEND_THRESHOLD = int(os.getenv('THIN_POOL_AUTOEXTEND_THRESHOLD', 80))
+THIN_POOL_AUTOEXTEND_PERCENT = int(os.getenv('THIN_POOL_AUTOEXTEND_PERCENT', 20))
+
+# Pre-formatted volumes kept for instant creation, e.g. 256m:2,1g:1
+WARM_POOL_SIZES = os.getenv('WARM_POOL_SIZES', '')
+WARM_POOL_INTERVAL = int(os.getenv('WARM_POOL_INTERVAL', 60))
+
+# Threads formatting and mounting distinct volumes concurrently, tasks
+# above workers + queue size wait up to the timeout and are rejected
+FS_WORKERS = int(os.getenv('FS_WORKERS', 4))
+FS_QUEUE_SIZE = int(os.getenv('FS_QUEUE_SIZE', 32))
+FS_QUEUE_TIMEOUT = float(os.getenv('FS_QUEUE_TIMEOUT', 30))
+
+# Upper bound of a single retry sleep and of all retries in a request
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 8))
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 60))
+
+METRICS_CACHE_TTL = int(os.getenv('METRICS_CACHE_TTL', 15))
+# Number of recent external commands kept for /debug/commands
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', 500))
+TRACE_SLOW_THRESHOLD = float(os.getenv('TRACE_SLOW_THRESHOLD', 5))
+
+LVM_SHELL_ENABLED = os.getenv('LVM_SHELL_ENABLED', 'false') == 'true'
+LVM_SHELL_TIMEOUT = int(os.getenv('LVM_SHELL_TIMEOUT', 60))
+
 LOG_DIR = os.getenv('LVMPY_LOG_DIR', '/var/log/docker-lvmpy')
 LOG_PATH = '/var/log/docker-lvmpy/lvmpy.log'
 LOG_PATH = os.path.join(LOG_DIR, 'lvmpy.log')
@@ -35,6 +79,7 @@ CRON_LOG_PATH = os.path.join(LOG_DIR, 'cron.log')
 OPT_DIR = '/opt/docker-lvmpy/'
 DOCKER_PLUGIN_DIR = '/etc/docker/plugins'
 DOCKER_PLUGIN_CONFIG_PATH = os.path.join(DOCKER_PLUGIN_DIR, 'lvmpy.json')
+DOCKER_PLUGIN_SPEC_PATH = os.path.join(DOCKER_PLUGIN_DIR, 'lvmpy.spec')
 
 ETC_DIR = '/etc/docker-lvmpy'
 ETC_CONFIG_PATH = os.path.join(ETC_DIR, 'lvm-environment')
@@ -50,7 +95,23 @@ LOG_FILE_SIZE_BYTES = LOG_FILE_SIZE_MB * 1000001
 LOG_BACKUP_COUNT = 3
 LOG_FORMAT = '[%(asctime)s %(levelname)s] %(name)s:%(lineno)d - %(threadName)s - %(message)s'  # noqa
 
-VOLUME_LIST_ROUTE = 'http://127.0.0.1:7373/VolumeDriver.List'
-CRON_SCHEDULE_MINUTES = 3
+LIVENESS_ROUTE = '/health/live'
+READINESS_ROUTE = '/health/ready'
+READINESS_URL = f'http://127.0.0.1:7373{READINESS_ROUTE}'
+# Not ready if the volume group watchdog has not completed a check for longer
+READINESS_MAX_STATE_AGE = int(
+    os.getenv('READINESS_MAX_STATE_AGE', 3 * VG_WATCHDOG_INTERVAL)
+)
+
+# Resident liveness probe, keep-alives are sent to the systemd watchdog.
+# The interval is capped at half of WatchdogSec (WATCHDOG_USEC)
+SUPERVISOR_INTERVAL = float(os.getenv('SUPERVISOR_INTERVAL', 10))
+SUPERVISOR_FAILURE_THRESHOLD = int(os.getenv('SUPERVISOR_FAILURE_THRESHOLD', 3))
+SUPERVISOR_PROBE_TIMEOUT = float(os.getenv('SUPERVISOR_PROBE_TIMEOUT', 1))
+SERVICE_WATCHDOG_SEC = 60
 
 PORT = 7373
+# Serve docker plugin api on unix socket, e.g. /run/docker/plugins/lvmpy.sock
+SOCKET_PATH = os.getenv('LVMPY_SOCKET')
+# Keep tcp listener (used by health checks) along with unix socket
+TCP_ENABLED = os.getenv('LVMPY_TCP', 'true') == 'true'
@@ -20,21 +20,48 @@
 import logging
 import os
 import subprocess
+import tempfile
+import threading
 import time
+from contextlib import ExitStack, contextmanager
 from functools import partial
-# from threading import Lock
-from multiprocessing import Lock
-from typing import Optional
-
-import psutil
+from typing import (
+    Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+)
 
 from .config import (
     MOUNTPOINT_BASE,
     PHYSICAL_VOLUME,
     VOLUME_GROUP,
     FILESTORAGE_MAPPING,
-    SHARED_VOLUMES
+    LVM_SHELL_ENABLED,
+    SHARED_VOLUMES,
+    THIN_POOL_AUTOEXTEND_PERCENT,
+    THIN_POOL_AUTOEXTEND_THRESHOLD,
+    THIN_POOL_NAME,
+    THIN_POOL_SIZE,
+    UNMOUNT_DIAGNOSTICS,
+    VOLUMES_CACHE_TTL
+)
+from .locks import generation, locks
+from .metrics import VolumeCollector
+from .mkfs import DEFAULT_FORMAT_OPTIONS, FormatOptions, mkfs_cmd
+from .mounts import mount_table
+from .procscan import ConsumerIndex, process_info, volume_devices
+from .report import (
+    LV_FIELDS,
+    STATE_FIELDS,
+    LogicalVolume,
+    LvmState,
+    parse_size,
+    parse_state,
+    parse_volumes,
+    report_cmd
 )
+from .retry import UNKNOWN, classify, is_retryable, next_delay
+from .shell import LvmShell, LvmShellCommandError, LvmShellError
+from .trace import tracer
+from .workers import fs_workers
 
 logger = logging.getLogger(__name__)
 
@@ -52,31 +79,63 @@ class LvmPyError(Exception):
     pass
 
 
-volume_lock = Lock()
+class CommandError(LvmPyError):
+    def __init__(self, message: str, error_class: str = UNKNOWN):
+        super().__init__(message)
+        self.error_class = error_class
+
 
 subprocess.run = partial(subprocess.run, stderr=subprocess.PIPE,
                          stdout=subprocess.PIPE)
 
 
 def run_cmd(cmd, retries=3):
-    res, err = None, None
+    res, err, error_class = None, None, UNKNOWN
     timeouts = compose_exponantional_timeouts(retries)
     lines = ' '.join(cmd)
     for attempt, timeout in enumerate(timeouts):
         logger.info(f'Command [{lines}] attempt {attempt}')
-        res = subprocess.run(cmd)
+        res = tracer.run(cmd, attempt=attempt)
         if res.returncode == 0:
             logger.info(f'Command [{lines}] success')
             return res.stdout.decode('utf-8')
+        err = res.stderr.decode('utf-8')
+        out = res.stdout.decode('utf-8')
+        error_class = classify(err, os.path.basename(cmd[0]))
+        delay = next_delay(error_class, attempt, timeouts)
+        logger.error(
+            f'Command [{lines}] attempt {attempt} failed ({error_class}) '
+            f'with {err}, out: {out}. ' +
+            (f'Sleeping for {delay:.2f}s' if delay is not None else 'Giving up')
+        )
+        if delay is None:
+            break
+        time.sleep(delay)
+    raise CommandError(f'Command [{lines}] failed, error: {err}', error_class)
+
+
+lvm_shell = LvmShell() if LVM_SHELL_ENABLED else None
+
+
+def run_lvm(cmd, retries=DEFAULT_RETRY_NUMBER):
+    """ Runs lvm command in the lvm shell falling back to run_cmd """
+    if lvm_shell is not None:
+        started_at, start = time.time(), time.monotonic()
+        try:
+            stdout = lvm_shell.execute(cmd)
+        except LvmShellCommandError as e:
+            tracer.record(cmd, started_at, time.monotonic() - start, 1)
+            error_class = classify(str(e))
+            if not is_retryable(error_class):
+                raise CommandError(str(e), error_class)
+            logger.warning(f'Lvm shell command failed: {e}. Falling back')
+        except LvmShellError as e:
+            tracer.record(cmd, started_at, time.monotonic() - start, 1)
+            logger.warning(f'Lvm shell failed: {e}. Falling back')
         else:
-            err = res.stderr.decode('utf-8')
-            out = res.stdout.decode('utf-8')
-            logger.error(
-                f'Command [{lines}] attempt {attempt} '
-                f'failed with {err}, out: {out}. Sleeping for {timeout}s'
-            )
-            time.sleep(timeout)
-    raise LvmPyError(f'Command [{lines}] failed, error: {err}')
+            tracer.record(cmd, started_at, time.monotonic() - start, 0)
+            return stdout
+    return run_cmd(cmd, retries=retries)
 
 
 def volume_mountpoint(volume):
@@ -95,13 +154,50 @@ def lsblk_device(volume):
     return f'{VOLUME_GROUP}-{block_device_name}'
 
 
+def lvm_state() -> LvmState:
+    """ Returns physical volumes, groups and logical volumes in one call """
+    return parse_state(run_lvm(report_cmd('pvs', STATE_FIELDS)))
+
+
+def driver_volumes(lvs: List[LogicalVolume]) -> List[LogicalVolume]:
+    """ Leaves volumes created through the driver api """
+    return [
+        lv for lv in lvs
+        if not lv.hidden and not lv.internal and not lv.thin_pool
+    ]
+
+
+def all_volumes(group: str = VOLUME_GROUP) -> List[LogicalVolume]:
+    stdout = run_lvm(report_cmd('lvs', LV_FIELDS, f'vg_name={group}'))
+    return parse_volumes(stdout)
+
+
+def query_volumes(group: str = VOLUME_GROUP) -> List[LogicalVolume]:
+    return driver_volumes(all_volumes(group=group))
+
+
+def volume_snapshots(
+    names: Iterable[str],
+    lvs: List[LogicalVolume]
+) -> List[str]:
+    """ Returns lvm snapshots ({volume}+{snapshot}) of the volumes """
+    prefixes = tuple(f'{name}+' for name in names)
+    return [
+        lv.name for lv in lvs
+        if lv.name.startswith(prefixes) and lv.name.count('+') == 1
+    ]
+
+
+def logical_volume(name: str, group: str = VOLUME_GROUP) -> Optional[LogicalVolume]:
+    stdout = run_lvm(report_cmd(
+        'lvs', LV_FIELDS, f'vg_name={group} && lv_name={name}'
+    ))
+    lvs = parse_volumes(stdout)
+    return lvs[0] if lvs else None
+
+
 def physical_volumes():
-    stdout = run_cmd(['pvs', '-o', 'name'])
-    pvs = list(filter(
-        None,
-        map(lambda x: x.strip(), stdout.split('\n'))
-    ))[1:]
-    return pvs
+    return [pv.name for pv in lvm_state().physical_volumes]
 
 
 def ensure_physical_volume(physical_volume=PHYSICAL_VOLUME):
@@ -110,55 +206,109 @@ def ensure_physical_volume(physical_volume=PHYSICAL_VOLUME):
         logger.warning(f'Physical volume {physical_volume} already created')
         return
 
-    with volume_lock:
-        run_cmd(['pvcreate', physical_volume, '-y'])
+    with locks.group():
+        run_lvm(['pvcreate', physical_volume, '-y'])
 
 
 def remove_physical_volume(physical_volume=PHYSICAL_VOLUME):
     if physical_volume in physical_volumes():
-        run_cmd(['pvremove', physical_volume, '-y'])
+        run_lvm(['pvremove', physical_volume, '-y'])
 
 
 def remove_volume_group(volume_group=VOLUME_GROUP):
     if volume_group in volume_groups():
-        run_cmd(['vgremove', volume_group, '-y'])
+        run_lvm(['vgremove', volume_group, '-y'])
 
 
 def volume_groups():
-    res = subprocess.run(['vgs', '-o', 'name'])
-    if res.returncode != 0:
-        stderr = res.stderr.decode('utf-8')
-        logger.error(f'Getting volume groups list failed {stderr}')
-        raise LvmPyError('Getting volume groups list failed')
-
-    stdout = res.stdout.decode('utf-8')
-    vgs = list(filter(
-        None,
-        map(lambda x: x.strip(), stdout.split('\n'))
-    ))[1:]
-    return vgs
+    return lvm_state().volume_groups()
 
 
 def ensure_volume_group(name=VOLUME_GROUP, physical_volume=PHYSICAL_VOLUME):
-    vgs = volume_groups()
-    if name in vgs:
+    state = lvm_state()
+    if name in state.volume_groups():
         logger.warning(f'Volume group {name} already created')
-        ensure_group_active(group=name)
-        return
+        ensure_group_active(group=name, state=state)
+    else:
+        ensure_physical_volume(physical_volume=physical_volume)
+        with locks.group():
+            run_lvm(['vgcreate', name, physical_volume])
+    ensure_thin_pool(group=name)
+
+
+def thin_pool_enabled() -> bool:
+    return THIN_POOL_SIZE is not None
 
-    ensure_physical_volume(physical_volume=physical_volume)
 
-    with volume_lock:
-        run_cmd(['vgcreate', name, physical_volume])
+def thin_pool(group: str = VOLUME_GROUP) -> Optional[LogicalVolume]:
+    stdout = run_lvm(report_cmd(
+        'lvs', LV_FIELDS, f'vg_name={group} && lv_name={THIN_POOL_NAME}'
+    ))
+    pools = [lv for lv in parse_volumes(stdout) if lv.thin_pool]
+    return pools[0] if pools else None
 
 
-def create(name: str, size_unit: str) -> None:
+def ensure_thin_pool(group: str = VOLUME_GROUP) -> None:
+    if not thin_pool_enabled() or thin_pool(group) is not None:
+        return
+    logger.info(f'Creating thin pool {THIN_POOL_NAME} of {THIN_POOL_SIZE}')
+    size_option = '-l' if '%' in THIN_POOL_SIZE else '-L'
+    with locks.group():
+        run_lvm([
+            'lvcreate', '--type', 'thin-pool', size_option, THIN_POOL_SIZE,
+            '-n', THIN_POOL_NAME, group
+        ])
+
+
+def ensure_thin_pool_capacity(group: str = VOLUME_GROUP) -> None:
+    """ Extends the pool data or metadata when usage crosses threshold """
+    if not thin_pool_enabled():
+        return
+    pool = thin_pool(group)
+    if pool is None:
+        return
+    pool_path = f'{group}/{THIN_POOL_NAME}'
+    threshold, percent = THIN_POOL_AUTOEXTEND_THRESHOLD, THIN_POOL_AUTOEXTEND_PERCENT
+    with locks.group():
+        if (pool.data_percent or 0) >= threshold:
+            logger.warning(f'Thin pool data usage is {pool.data_percent}%. Extending')
+            run_lvm(['lvextend', '-l', f'+{percent}%LV', pool_path])
+        if (pool.metadata_percent or 0) >= threshold:
+            logger.warning(
+                f'Thin pool metadata usage is {pool.metadata_percent}%. Extending'
+            )
+            extension = pool.metadata_size * percent // 100
+            run_lvm([
+                'lvextend', '--poolmetadatasize', f'+{extension}b', pool_path
+            ])
+
+
+def create_logical_volume(name: str, size_unit: str, thin: bool = False) -> None:
     if size_unit.endswith('b'):
         size_unit = size_unit[:-1]
-    logger.info(f'Creating volume with size {size_unit}b')
-    with volume_lock:
-        run_cmd(['lvcreate', '-L', f'{size_unit}b', '-n', name, VOLUME_GROUP])
-    res = subprocess.run(['mkfs.btrfs', '-f', volume_device(name)])
+    logger.info(f'Creating volume with size {size_unit}b, thin: {thin}')
+    if thin and not thin_pool_enabled():
+        raise LvmPyError('Thin pool is not configured')
+    if thin:
+        cmd = [
+            'lvcreate', '-V', f'{size_unit}b', '--thin', '-n', name,
+            f'{VOLUME_GROUP}/{THIN_POOL_NAME}'
+        ]
+    else:
+        cmd = ['lvcreate', '-L', f'{size_unit}b', '-n', name, VOLUME_GROUP]
+    with locks.volume(name):
+        run_lvm(cmd)
+    volume_cache.add(name)
+    if thin:
+        ensure_thin_pool_capacity()
+
+
+def format_volume(
+    name: str,
+    options: FormatOptions = DEFAULT_FORMAT_OPTIONS,
+    thin: bool = False
+) -> None:
+    res = tracer.run(mkfs_cmd(volume_device(name), options, thin=thin))
     if res.returncode != 0:
         stderr = res.stderr.decode('utf-8')
         cmd_line = ' '.join(res.args)
@@ -167,16 +317,31 @@ def create(name: str, size_unit: str) -> None:
         raise LvmPyError(f'Command {cmd_line} failed')
 
 
+def create(
+    name: str,
+    size_unit: str,
+    thin: bool = False,
+    format_options: FormatOptions = DEFAULT_FORMAT_OPTIONS
+) -> None:
+    create_logical_volume(name, size_unit, thin=thin)
+    fs_workers.run(format_volume, name, format_options, thin)
+
+
 def remove(name: str, is_schain=True) -> None:
     if name in SHARED_VOLUMES:
         logger.warning('Attempt to remove shared %s volume', name)
         return
     mountpoint = volume_mountpoint(name)
     logger.info(f'Removing device with {mountpoint}')
-    if os.path.ismount(mountpoint):
+    if mount_table.is_mounted(mountpoint):
         unmount(name, is_schain)
-    with volume_lock:
-        run_cmd(['lvremove', '-f', volume_device(name)])
+    # snapshots would be left without an origin no api refers to
+    snapshots = volume_snapshots([name], all_volumes())
+    if snapshots:
+        logger.info(f'Removing lvm snapshots {snapshots} of {name}')
+    with locks.volume(name):
+        run_lvm(['lvremove', '-f', *map(volume_device, [name, *snapshots])])
+    volume_cache.discard(name)
     logger.info(f'Checking if we need to remove {mountpoint}')
     if os.path.exists(mountpoint):
         logger.info(f'Removing {mountpoint}')
@@ -184,14 +349,18 @@ def remove(name: str, is_schain=True) -> None:
 
 
 def mount(name: str, is_schain=True) -> str:
+    return fs_workers.run(mount_volume, name, is_schain)
+
+
+def mount_volume(name: str, is_schain=True) -> str:
     is_shared = name in SHARED_VOLUMES
     logger.info('Mounting volume %s, shared: %s', name, is_shared)
     mountpoint = volume_mountpoint(name)
     device = volume_device(name)
     logger.info('Mountpoint for %s: %s, device: %s', name, mountpoint, device)
     if is_shared:
-        with volume_lock:
-            if os.path.ismount(mountpoint):
+        with locks.volume(name):
+            if mount_table.is_mounted(mountpoint):
                 logger.info(
                     'Shared volume %s is already mounted onto %s',
                     name, mountpoint
@@ -200,16 +369,18 @@ def mount(name: str, is_schain=True) -> str:
                 if not os.path.exists(mountpoint):
                     os.makedirs(mountpoint)
                 run_cmd(['mount', device, mountpoint])
+            volume_cache.update(name, mountpoint=mountpoint)
             return mountpoint
 
-    if os.path.ismount(mountpoint):
+    if mount_table.is_mounted(mountpoint):
         logger.info('%s mountpoint is already in use', mountpoint)
         unmount(name, is_schain)
     if not os.path.exists(mountpoint):
         os.makedirs(mountpoint)
 
-    with volume_lock:
+    with locks.volume(name):
         run_cmd(['mount', device, mountpoint])
+    volume_cache.update(name, mountpoint=mountpoint)
 
     if is_schain and not is_shared:
         filestorage_path = os.path.join(mountpoint, 'filestorage')
@@ -223,69 +394,67 @@ def mount(name: str, is_schain=True) -> str:
     return mountpoint
 
 
-def physical_volume_from_group(group: str) -> str:
-    vgs = volume_groups()
-    if group not in vgs:
+def physical_volume_from_group(group: str) -> Optional[str]:
+    pvs = lvm_state().group_physical_volumes(group)
+    if not pvs:
         return None
+    return pvs[0]
 
-    return run_cmd(
-        ['sudo', 'vgs', '-o', 'pv_name', group, '--noheadings']
-    ).strip()
 
+def path_user(path, index: Optional[ConsumerIndex] = None):
+    index = index or ConsumerIndex().scan()
+    return index.path_users(path)
 
-def path_user(path):
-    res = subprocess.run(['fuser', path])
-    if res.returncode == 0:
-        str_pids = res.stdout.decode('utf-8').strip().split()
-        return list(map(int, str_pids))
-    else:
-        return []
 
-
-def file_in_path_user(path):
+def file_in_path_user(path, index: Optional[ConsumerIndex] = None):
     logger.info(f'Checking who is using files in {path} ...')
     files = os.listdir(path)
     if len(files) == 0:
         return []
     filepath = os.path.join(path, files[0])
     logger.info(f'Checking filepath {filepath} ...')
-    return path_user(filepath)
-
+    return path_user(filepath, index=index)
 
-def log_lsof_for_volume_device(volume):
-    device = volume_device(volume)
-    logger.info(f'Checking lsof for {device}')
-    cmd = ['lsof', '+f', '--', device]
-    res = subprocess.run(cmd)
-    out = res.stdout.decode('utf-8')
-    err = res.stderr.decode('utf-8')
-    logger.info(f'Lsof returned err: {err}; out: {out}')
 
-
-def device_users(name):
+def device_users(name, index: Optional[ConsumerIndex] = None):
     path = volume_device(name)
-    return path_user(path)
+    return path_user(path, index=index)
 
 
-def mountpoint_users(name):
+def mountpoint_users(name, index: Optional[ConsumerIndex] = None):
     path = volume_mountpoint(name)
-    return path_user(path)
+    return path_user(path, index=index)
 
 
-def file_users(name):
+def file_users(name, index: Optional[ConsumerIndex] = None):
     path = volume_mountpoint(name)
-    return file_in_path_user(path)
-
-
-def process_info(pid):
-    ps = psutil.Process(pid)
-    return ps.as_dict()
+    return file_in_path_user(path, index=index)
 
 
 def log_consumers(consumers):
     for pid in consumers:
-        info = process_info(pid)
-        logger.info(f'PID {pid}: {info}')
+        logger.info(f'PID {pid}: {process_info(pid)}')
+
+
+def log_volume_consumers(name, detailed=False):
+    device, mountpoint = volume_device(name), volume_mountpoint(name)
+    index = ConsumerIndex().scan()
+    consumers = index.device_users(volume_devices(device, mountpoint))
+    logger.info(f'Volume {name} is used by {len(consumers)} processes')
+    for pid, reasons in consumers.items():
+        logger.info(f'PID {pid} ({", ".join(sorted(reasons))}): '
+                    f'{process_info(pid)}')
+    if detailed:
+        for kind, users in (
+            ('Device', device_users(name, index=index)),
+            ('Mountpoint', mountpoint_users(name, index=index)),
+            ('File', file_users(name, index=index))
+        ):
+            logger.info(f'{kind} is used by {len(users)}: {users}')
+
+
+def is_busy_error(stderr: str) -> bool:
+    return 'busy' in stderr
 
 
 def unmount(name, is_schain=True):
@@ -293,27 +462,20 @@ def unmount(name, is_schain=True):
         logger.warning('Attempt to umount shared %s volume', name)
         return
 
-    log_lsof_for_volume_device(name)
-
-    device_consumers = device_users(name)
-    logger.info(f'Device is used by {len(device_consumers)}: '
-                f'{device_consumers}')
-    log_consumers(device_consumers)
-
-    mountpoint_consumers = mountpoint_users(name)
-    logger.info(f'Mountpoint is used by {len(mountpoint_consumers)}: '
-                f'{mountpoint_consumers}')
-    log_consumers(mountpoint_consumers)
-
-    file_consumers = file_users(name)
-    logger.info(f'File is used by {len(file_consumers)}: '
-                f'{file_consumers}')
-    log_consumers(file_consumers)
+    if UNMOUNT_DIAGNOSTICS == 'always':
+        log_volume_consumers(name, detailed=True)
 
     device = volume_device(name)
     cmd = ['umount', device]
-    with volume_lock:
-        run_cmd(cmd, retries=UNMOUNT_RETRIES_NUMBER)
+    with locks.volume(name):
+        res = tracer.run(cmd)
+        if res.returncode != 0:
+            err = res.stderr.decode('utf-8')
+            logger.warning(f'Fast unmount of {name} failed with {err}')
+            if is_busy_error(err) and UNMOUNT_DIAGNOSTICS != 'off':
+                log_volume_consumers(name)
+            run_cmd(cmd, retries=UNMOUNT_RETRIES_NUMBER)
+    volume_cache.update(name, mountpoint=None)
 
     if is_schain:
         link_name = os.path.join(FILESTORAGE_MAPPING, name)
@@ -321,26 +483,415 @@ def unmount(name, is_schain=True):
 
 
 def path(name):
-    stdout = run_cmd(['findmnt', volume_device(name), '--output', 'source'])
-    if not stdout:
-        return None
-
-    result = list(filter(None, stdout.split('\n')))[1]
-    return result
+    device = volume_device(name)
+    if not mount_table.mounts(device):
+        raise LvmPyError(f'Volume {name} is not mounted')
+    return device
 
 
-def volumes(group=VOLUME_GROUP):
-    stdout = run_cmd(['lvs', '-o', 'name', '-S', f'vg_name={VOLUME_GROUP}'])
-    lvs = list(filter(
-        None,
-        map(lambda x: x.strip(), stdout.split('\n'))
-    ))[1:]
-    return lvs
+@contextmanager
+def mounted(name: str) -> Iterator[str]:
+    """ Yields a mountpoint of the volume, mounting it temporarily if needed """
+    device = volume_device(name)
+    mounts = mount_table.mounts(device)
+    if mounts:
+        yield mounts[0].mountpoint
+        return
+    mountpoint = tempfile.mkdtemp(prefix=f'lvmpy-{name}-')
+    try:
+        run_cmd(['mount', device, mountpoint])
+        try:
+            yield mountpoint
+        finally:
+            run_cmd(['umount', mountpoint])
+    finally:
+        os.rmdir(mountpoint)
 
 
-def get(name):
-    lvs = volumes()
-    if name not in lvs:
+def grow_filesystem(name: str) -> None:
+    """ Grows btrfs to the volume size """
+    with mounted(name) as mountpoint:
+        run_cmd(['btrfs', 'filesystem', 'resize', 'max', mountpoint])
+
+
+def resize_many(sizes: Dict[str, str]) -> None:
+    """ Grows volumes to the new sizes holding the group lock once """
+    current = {lv.name: lv.size for lv in query_volumes()}
+    targets = {}
+    for name, size_unit in sizes.items():
+        if name not in current:
+            raise LvmPyError(f'Volume {name} does not exist')
+        size = parse_size(size_unit)
+        if size is None:
+            raise LvmPyError(f'Invalid size {size_unit} for {name}')
+        if size < current[name]:
+            raise LvmPyError(
+                f'Volume {name} cannot be shrunk from {current[name]}b to {size}b'
+            )
+        targets[name] = size
+
+    with locks.group():
+        for name, size in targets.items():
+            logger.info(f'Resizing volume {name} to {size}b')
+            with locks.volume(name):
+                if size > current[name]:
+                    run_lvm(['lvextend', '-L', f'{size}b', f'{VOLUME_GROUP}/{name}'])
+                grow_filesystem(name)
+        # lvm rounds sizes up to whole extents
+        resized = {lv.name: lv.size for lv in query_volumes()}
+    for name in targets:
+        volume_cache.update(name, size=resized.get(name, targets[name]))
+    if thin_pool_enabled():
+        ensure_thin_pool_capacity()
+
+
+def resize(name: str, size_unit: str) -> None:
+    resize_many({name: size_unit})
+
+
+BATCH_OPERATIONS = ('unmount', 'remove', 'create', 'mount')
+
+
+class VolumeOperation(NamedTuple):
+    op: str
+    name: str
+    size: Optional[str] = None
+    thin: bool = False
+    is_schain: bool = True
+    format_options: FormatOptions = DEFAULT_FORMAT_OPTIONS
+
+
+class OperationResult(NamedTuple):
+    op: str
+    name: str
+    error: Optional[str] = None
+    mountpoint: Optional[str] = None
+
+
+def run_parallel(
+    func: Callable[[VolumeOperation], Optional[str]],
+    operations: Dict[int, VolumeOperation]
+) -> Dict[int, tuple]:
+    """ Runs func for every operation in the filesystem workers.
+
+    Returns (value, error) pairs keyed as operations.
+    """
+    futures, outcomes = {}, {}
+    for i, operation in operations.items():
+        try:
+            futures[i] = fs_workers.submit(func, operation)
+        except Exception as e:
+            outcomes[i] = (None, str(e))
+    for i, future in futures.items():
+        try:
+            outcomes[i] = (future.result(), None)
+        except Exception as e:
+            logger.exception(f'Batch operation {operations[i]} failed')
+            outcomes[i] = (None, str(e) or type(e).__name__)
+    return outcomes
+
+
+def remove_many(operations: Dict[int, VolumeOperation]) -> Dict[int, str]:
+    """ Removes volumes along with their lvm snapshots by a single lvremove,
+    returns errors by index """
+    errors = {}
+    lvs = all_volumes()
+    existing = {lv.name for lv in driver_volumes(lvs)}
+    targets = {}
+    for i, operation in operations.items():
+        if operation.name in SHARED_VOLUMES:
+            logger.warning('Attempt to remove shared %s volume', operation.name)
+        elif operation.name not in existing:
+            errors[i] = f'Volume {operation.name} does not exist'
+        else:
+            targets[i] = operation
+
+    def unmount_mounted(operation: VolumeOperation) -> None:
+        if mount_table.is_mounted(volume_mountpoint(operation.name)):
+            unmount(operation.name, operation.is_schain)
+
+    for i, (_, error) in run_parallel(unmount_mounted, targets).items():
+        if error is not None:
+            errors[i] = error
+            del targets[i]
+
+    names = sorted({operation.name for operation in targets.values()})
+    if not names:
+        return errors
+    snapshots = volume_snapshots(names, lvs)
+    with ExitStack() as stack:
+        for name in names:
+            stack.enter_context(locks.volume(name))
+        try:
+            run_lvm([
+                'lvremove', '-f', *map(volume_device, names + snapshots)
+            ])
+        except LvmPyError as e:
+            left = {lv.name for lv in query_volumes()}
+            for i, operation in targets.items():
+                if operation.name in left:
+                    errors[i] = str(e)
+    for i, operation in targets.items():
+        if i in errors:
+            continue
+        volume_cache.discard(operation.name)
+        mountpoint = volume_mountpoint(operation.name)
+        if os.path.exists(mountpoint):
+            os.rmdir(mountpoint)
+    return errors
+
+
+def batch(
+    operations: List[VolumeOperation],
+    take: Optional[Callable[[str, str], bool]] = None
+) -> List[OperationResult]:
+    """ Runs many volume operations with as few lvm commands as possible.
+
+    Operations are grouped into phases that run in order: unmount,
+    remove, create, mount. Removals are done by a single lvremove,
+    the group is activated once, volumes are created one by one and
+    independent unmount, mkfs and mount steps run in parallel.
+    In the create phase `take(name, size)` (e.g. the warm pool) may
+    provide a formatted thick volume with default options instead.
+    Returns a result for every operation in the input order.
+    """
+    errors: Dict[int, str] = {}
+    mountpoints: Dict[int, str] = {}
+    phases: Dict[str, Dict[int, VolumeOperation]] = {
+        op: {} for op in BATCH_OPERATIONS
+    }
+    for i, operation in enumerate(operations):
+        if operation.op not in phases:
+            errors[i] = f'Unknown operation {operation.op}'
+        elif operation.op == 'create' and not operation.size:
+            errors[i] = f'Size is required to create {operation.name}'
+        else:
+            phases[operation.op][i] = operation
+
+    if phases['create'] or phases['mount']:
+        ensure_group_active()
+
+    for i, (_, error) in run_parallel(
+        lambda operation: unmount(operation.name, operation.is_schain),
+        phases['unmount']
+    ).items():
+        if error is not None:
+            errors[i] = error
+
+    errors.update(remove_many(phases['remove']))
+
+    created = {}
+    for i, operation in phases['create'].items():
+        if take is not None and not operation.thin and \
+                operation.format_options == DEFAULT_FORMAT_OPTIONS and \
+                take(operation.name, operation.size):
+            continue
+        try:
+            create_logical_volume(
+                operation.name, operation.size, thin=operation.thin
+            )
+        except LvmPyError as e:
+            errors[i] = str(e)
+        else:
+            created[i] = operation
+    for i, (_, error) in run_parallel(
+        lambda operation: format_volume(
+            operation.name, operation.format_options, thin=operation.thin
+        ),
+        created
+    ).items():
+        if error is not None:
+            errors[i] = error
+
+    for i, (mountpoint, error) in run_parallel(
+        lambda operation: mount(operation.name, operation.is_schain),
+        phases['mount']
+    ).items():
+        if error is not None:
+            errors[i] = error
+        else:
+            mountpoints[i] = mountpoint
+
+    return [
+        OperationResult(
+            op=operation.op,
+            name=operation.name,
+            error=errors.get(i),
+            mountpoint=mountpoints.get(i)
+        )
+        for i, operation in enumerate(operations)
+    ]
+
+
+def describe_volumes(lvs: List[LogicalVolume]) -> Dict[str, dict]:
+    info = {}
+    for lv in lvs:
+        mounts = mount_table.mounts(volume_device(lv.name))
+        info[lv.name] = {
+            'size': lv.size,
+            'attr': lv.attr,
+            'active': lv.active,
+            'devices': lv.devices,
+            'data_percent': lv.data_percent,
+            'metadata_percent': lv.metadata_percent,
+            'mountpoint': mounts[0].mountpoint if mounts else None
+        }
+    return info
+
+
+def volumes_info(group: str = VOLUME_GROUP) -> Dict[str, dict]:
+    """ Returns attributes of logical volumes in the group keyed by name """
+    return describe_volumes(query_volumes(group=group))
+
+
+class VolumeCache:
+    """ Process-wide cache of logical volumes of the lvmpy volume group.
+
+    Entries are refreshed from lvm when ttl expires and are updated in place
+    by the operations that change them (create, remove, mount, unmount).
+    In multiprocess mode changes made by other workers are detected
+    through the shared generation marker.
+    """
+
+    def __init__(self, group: str = VOLUME_GROUP, ttl: int = VOLUMES_CACHE_TTL):
+        self.group = group
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._volumes: Optional[Dict[str, dict]] = None
+        self._updated_at = 0.0
+        self._version = 0
+        self._generation = 0
+
+    @property
+    def expired(self) -> bool:
+        return self._volumes is None or \
+            time.monotonic() - self._updated_at > self.ttl
+
+    @property
+    def age(self) -> Optional[float]:
+        """ Seconds since volumes were loaded from lvm, None if not loaded """
+        if self._volumes is None:
+            return None
+        return time.monotonic() - self._updated_at
+
+    @property
+    def version(self) -> int:
+        """ Number of in place changes, used to detect concurrent updates """
+        return self._version
+
+    def replace(
+        self,
+        volumes: Dict[str, dict],
+        version: int,
+        observed_generation: int = 0
+    ) -> None:
+        with self._lock:
+            if version != self._version:
+                # volumes were changed while lvm was queried
+                self._volumes = None
+                return
+            self._volumes = dict(volumes)
+            self._updated_at = time.monotonic()
+            self._generation = observed_generation
+
+    def refresh(self) -> Dict[str, dict]:
+        # lvm is queried without holding the lock to keep readers unblocked
+        version, observed_generation = self._version, generation.current()
+        volumes = volumes_info(group=self.group)
+        self.replace(volumes, version, observed_generation)
+        return volumes
+
+    def _changed(self) -> None:
+        self._version += 1
+        if self._generation != generation.current():
+            # volumes were changed by another process as well
+            self._volumes = None
+        self._generation = generation.bump()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._changed()
+            self._volumes = None
+
+    def last(self) -> Optional[Dict[str, dict]]:
+        """ Returns the last loaded volumes even if they are expired """
+        with self._lock:
+            return None if self._volumes is None else dict(self._volumes)
+
+    def cached(self) -> Optional[Dict[str, dict]]:
+        """ Returns cached volumes or None if they should be reloaded """
+        with self._lock:
+            if self.expired or self._generation != generation.current():
+                return None
+            return dict(self._volumes)
+
+    def volumes(self, force: bool = False) -> Dict[str, dict]:
+        volumes = None if force else self.cached()
+        if volumes is None:
+            volumes = self.refresh()
+        return volumes
+
+    def get(self, name: str, force: bool = False) -> Optional[dict]:
+        info = self.volumes(force=force).get(name)
+        if info is None and not force:
+            # volume could be created bypassing the driver
+            info = self.refresh().get(name)
+        return info
+
+    def add(self, name: str, **attrs) -> None:
+        with self._lock:
+            self._changed()
+            if self._volumes is not None:
+                self._volumes[name] = {
+                    'size': None, 'attr': None, 'active': True,
+                    'devices': (), 'mountpoint': None,
+                    **attrs
+                }
+
+    def update(self, name: str, **attrs) -> None:
+        with self._lock:
+            self._changed()
+            if self._volumes is not None and name in self._volumes:
+                self._volumes[name] = {**self._volumes[name], **attrs}
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            self._changed()
+            if self._volumes is not None:
+                self._volumes.pop(name, None)
+
+
+volume_cache = VolumeCache()
+
+
+def known_volumes() -> Dict[str, dict]:
+    """ Returns volumes known without querying lvm: the last loaded cache
+    entries or, before the cache is loaded, the mounted volumes """
+    volumes = volume_cache.last()
+    if volumes is not None:
+        return volumes
+    prefix = volume_mountpoint('')
+    return {
+        mount.mountpoint[len(prefix):]: {'mountpoint': mount.mountpoint}
+        for mount in mount_table.under(prefix)
+    }
+
+
+volume_collector = VolumeCollector(known_volumes, volume_device)
+
+
+def volumes(group=VOLUME_GROUP, cached=False):
+    if cached and group == volume_cache.group:
+        return list(volume_cache.volumes())
+    return list(volumes_info(group=group))
+
+
+def get(name, cached=False):
+    if cached:
+        info = volume_cache.get(name)
+    else:
+        info = volumes_info().get(name)
+    if info is None:
         return None
     return name
 
@@ -353,32 +904,27 @@ def get_block_device_size(device: str = PHYSICAL_VOLUME) -> int:
 
 
 def get_inactive_volumes(group: Optional[str] = VOLUME_GROUP) -> list:
-    output = run_cmd(['lvscan'])
-    if not output:  # no volumes
-        return []
-    inactive = []
-    for line in output.split('\n'):
-        result = list(filter(lambda s: s.strip() != '', line.split()))
-        if not result:
-            break
-        status, device = result[:2]
-        # device example: '/dev/test/t1'
-        device = device[2:-1]  # remove colums and / at the beginning
-        _, group, volume = device.split('/')
-        if group == group and status == 'inactive':
-            inactive.append(volume)
-    return inactive
+    # thin volumes have no segments on physical volumes, so they are
+    # queried with lvs rather than taken from the pvs state report
+    return [
+        lv.name for lv in query_volumes(group=group)
+        if not lv.active and not lv.activation_skip
+    ]
 
 
 def activate_group(group: Optional[str] = VOLUME_GROUP) -> None:
     logger.info(f'Changing {group} to active')
-    with volume_lock:
-        run_cmd(['vgchange', '-ay', group])
+    with locks.group():
+        run_lvm(['vgchange', '-ay', group])
+    volume_cache.invalidate()
 
 
-def ensure_group_active(group: Optional[str] = VOLUME_GROUP) -> None:
-    groups = volume_groups()
-    if group in groups:
+def ensure_group_active(
+    group: Optional[str] = VOLUME_GROUP,
+    state: Optional[LvmState] = None
+) -> None:
+    state = state or lvm_state()
+    if group in state.volume_groups():
         inactive = get_inactive_volumes(group=group)
         if len(inactive) > 0:
             logger.warning(
@@ -2,22 +2,22 @@ import logging
 
 import crontab
 
-from .config import CRON_LOG_PATH, CRON_SCHEDULE_MINUTES
-
 
 logger = logging.getLogger(__name__)
 
+HEAL_COMMAND = 'health.heal_service()'
+
 
-def init_cron():
-    logger.info('Ensuring cron job for healing lvmpy')
-    cron_line = f'cd /opt/docker-lvmpy && venv/bin/python -c "import health; health.heal_service()" >> {CRON_LOG_PATH} 2>&1'  # noqa
-    with crontab.CronTab(user='root') as c:
-        if cron_line not in [c.command for c in c]:
-            job = c.new(
-                command=cron_line
-            )
-            job.minute.every(CRON_SCHEDULE_MINUTES)
+def remove_cron():
+    """ Drops the healing job installed by previous versions, the service
+    is now supervised by the systemd watchdog """
+    logger.info('Removing legacy cron job for healing lvmpy')
+    try:
+        with crontab.CronTab(user='root') as c:
+            c.remove_all(command=HEAL_COMMAND)
+    except (OSError, ValueError) as e:
+        logger.warning('Cron job cannot be removed %s', e)
 
 
 if __name__ == '__main__':
-    init_cron()
+    remove_cron()
@@ -1,15 +1,31 @@
 import logging
+import os
 import sys
 import time
 import traceback
 from contextlib import contextmanager
-from typing import Optional
+from typing import Callable, List, NamedTuple, Optional
 
 import docker
 import requests
 
-from .config import VOLUME_LIST_ROUTE
-from .core import ensure_group_active, run_cmd
+from .config import READINESS_URL, SUPERVISOR_PROBE_TIMEOUT, VOLUME_GROUP
+from .core import (
+    create_logical_volume,
+    ensure_group_active,
+    format_volume,
+    get_inactive_volumes,
+    logical_volume,
+    lvm_state,
+    LvmPyError,
+    mount,
+    remove,
+    run_cmd,
+    thin_pool_enabled,
+    unmount,
+    volume_mountpoint
+)
+from .mounts import mount_table
 
 MIN_BTRFS_VOLUME_SIZE = 209715200
 
@@ -34,8 +50,13 @@ class ExecFailedError(Exception):
 
 
 class EndpointCheck:
-    def __init__(self, url: str = VOLUME_LIST_ROUTE):
+    def __init__(
+        self,
+        url: str = READINESS_URL,
+        timeout: float = SUPERVISOR_PROBE_TIMEOUT
+    ):
         self.url = url
+        self.timeout = timeout
 
     def run(self) -> bool:
         retries = 5
@@ -43,7 +64,7 @@ class EndpointCheck:
         for attempt in range(retries):
             logger.debug(f'Checking lvmpy endpoint. Attempt: {attempt}')
             try:
-                res = requests.post(self.url)
+                res = requests.get(self.url, timeout=self.timeout)
                 code = res.status_code
             except Exception as e:
                 err = e
@@ -170,6 +191,103 @@ class PreinstallCheck:
                     print(msg)
 
 
+class CheckStep(NamedTuple):
+    name: str
+    elapsed: float
+    error: Optional[str] = None
+
+
+class FastCheck:
+    """ Verifies the driver invariants in process, without docker.
+
+    The volume group is checked, then a scratch volume goes through
+    create, mkfs, mount, btrfs snapshot, unmount and remove on the host.
+    The scratch name contains '+', so it never shows up in volume lists.
+    """
+
+    def __init__(
+        self,
+        group: str = VOLUME_GROUP,
+        volume: str = 'health+scratch',
+        volume_size: int = MIN_BTRFS_VOLUME_SIZE
+    ):
+        self.group = group
+        self.volume = volume
+        self.volume_size = volume_size
+        self.steps: List[CheckStep] = []
+
+    def check_volume_group(self):
+        state = lvm_state()
+        if self.group not in state.volume_groups():
+            raise LvmPyError(f'Volume group {self.group} does not exist')
+        # pvs segments miss thin volumes and include hidden ones that
+        # are never active (e.g. pool metadata spare), so lvs is used
+        inactive = get_inactive_volumes(group=self.group)
+        if inactive:
+            raise LvmPyError(f'Volumes {inactive} are not active')
+
+    def create_volume(self):
+        create_logical_volume(
+            self.volume, str(self.volume_size), thin=thin_pool_enabled()
+        )
+
+    def format_volume(self):
+        format_volume(self.volume, thin=thin_pool_enabled())
+
+    def mount_volume(self):
+        mount(self.volume, is_schain=False)
+
+    def check_snapshot(self):
+        mountpoint = volume_mountpoint(self.volume)
+        subvolume = os.path.join(mountpoint, 'test-sub')
+        snapshot = os.path.join(mountpoint, 'test-snap')
+        run_cmd(['btrfs', 'subvolume', 'create', subvolume], retries=1)
+        try:
+            run_cmd(['btrfs', 'subvolume', 'snapshot', subvolume, snapshot],
+                    retries=1)
+            run_cmd(['btrfs', 'subvolume', 'delete', snapshot], retries=1)
+        finally:
+            run_cmd(['btrfs', 'subvolume', 'delete', subvolume], retries=1)
+
+    def unmount_volume(self):
+        unmount(self.volume, is_schain=False)
+
+    def remove_volume(self):
+        remove(self.volume, is_schain=False)
+
+    def step(self, name: str, func: Callable) -> None:
+        start = time.monotonic()
+        try:
+            func()
+        except Exception as e:
+            self.steps.append(CheckStep(name, time.monotonic() - start, str(e)))
+            raise
+        self.steps.append(CheckStep(name, time.monotonic() - start))
+        print(f'{name}: ok in {self.steps[-1].elapsed:.3f}s')
+
+    def cleanup(self):
+        if mount_table.is_mounted(volume_mountpoint(self.volume)):
+            self.unmount_volume()
+        if logical_volume(self.volume, group=self.group) is not None:
+            self.remove_volume()
+
+    def run(self) -> List[CheckStep]:
+        self.steps = []
+        self.step('volume-group', self.check_volume_group)
+        # scratch volume could be left by an interrupted check
+        self.cleanup()
+        try:
+            self.step('create', self.create_volume)
+            self.step('mkfs', self.format_volume)
+            self.step('mount', self.mount_volume)
+            self.step('snapshot', self.check_snapshot)
+            self.step('unmount', self.unmount_volume)
+            self.step('remove', self.remove_volume)
+        finally:
+            self.cleanup()
+        return self.steps
+
+
 def heal_service(ec: Optional[EndpointCheck] = None) -> bool:
     ec = ec or EndpointCheck()
     if not ec.run():
@@ -181,17 +299,20 @@ def heal_service(ec: Optional[EndpointCheck] = None) -> bool:
     return False
 
 
-def run_healthcheck(vg=None):
-    logger.info('Running healthcheck with volume group %s', vg)
+def run_healthcheck(vg=None, deep=False):
+    logger.info('Running healthcheck with volume group %s, deep %s', vg, deep)
 
     if vg is not None:
         ensure_group_active(group=vg)
-    pc = PreinstallCheck(
-        container='healthcheck-container',
-        volume='healthcheck-volume'
-    )
+    if deep:
+        check = PreinstallCheck(
+            container='healthcheck-container',
+            volume='healthcheck-volume'
+        )
+    else:
+        check = FastCheck(group=vg or VOLUME_GROUP)
     try:
-        pc.run()
+        check.run()
     except Exception:
         traceback.print_exc()
         print('Driver is not healthy')
@@ -201,10 +322,11 @@ def run_healthcheck(vg=None):
 
 
 def main():
-    vg = None
-    if len(sys.argv) > 1:
-        vg = sys.argv[1]
-    run_healthcheck(vg=vg)
+    args = sys.argv[1:]
+    deep = '--deep' in args
+    args = [arg for arg in args if arg != '--deep']
+    vg = args[0] if args else None
+    run_healthcheck(vg=vg, deep=deep)
 
 
 if __name__ == '__main__':
@@ -5,6 +5,7 @@ import os
 from .config import (
     DOCKER_PLUGIN_DIR,
     DOCKER_PLUGIN_CONFIG_PATH,
+    DOCKER_PLUGIN_SPEC_PATH,
     FILESTORAGE_MAPPING,
     ETC_DIR,
     ETC_CONFIG_PATH,
@@ -12,14 +13,20 @@ from .config import (
     OPT_DIR,
     PHYSICAL_VOLUME,
     PORT,
+    SERVER_MODE,
+    SERVER_THREADS,
+    SERVER_WORKERS,
     SERVICE_DIR,
     SERVICE_EXEC_START,
     SERVICE_PATH,
     SERVICE_NAME,
+    SERVICE_WATCHDOG_SEC,
+    SOCKET_PATH,
     VOLUME_GROUP
 )
 from .core import LvmPyError, run_cmd
 from .cleanup import cleanup_volumes
+from .cron import remove_cron
 # from .health import run_healthcheck
 
 
@@ -62,7 +69,8 @@ def load_btrfs_kernel_module():
 
 def generate_systemd_service_config(
     exec_start=SERVICE_EXEC_START,
-    etc_config_path=ETC_CONFIG_PATH
+    etc_config_path=ETC_CONFIG_PATH,
+    watchdog_sec=SERVICE_WATCHDOG_SEC
 ):
     return f"""
 [Unit]
@@ -71,11 +79,12 @@ Conflicts=getty@tty1.service
 After=network.target
 
 [Service]
-Type=simple
+Type=notify
 WorkingDirectory=/opt/docker-lvmpy/
 ExecStart={exec_start}
 EnvironmentFile={etc_config_path}
 Restart=on-failure
+WatchdogSec={watchdog_sec}
 KillSignal=SIGINT
 StandardError=syslog
 NotifyAccess=all
@@ -93,12 +102,50 @@ def generate_plugin_config(port=PORT):
     }
 
 
-def generate_etc_config(block_device, volume_group, filestorage_mapping):
-    return '\n'.join([
+def generate_plugin_spec(socket_path=SOCKET_PATH):
+    return f'unix://{socket_path}'
+
+
+def write_plugin_config(port=PORT, socket_path=SOCKET_PATH):
+    if socket_path is None:
+        docker_plugin_config = generate_plugin_config(port=port)
+        with open(DOCKER_PLUGIN_CONFIG_PATH, 'w') as docker_plugin_config_file:
+            json.dump(docker_plugin_config, docker_plugin_config_file)
+        if os.path.isfile(DOCKER_PLUGIN_SPEC_PATH):
+            os.remove(DOCKER_PLUGIN_SPEC_PATH)
+    else:
+        with open(DOCKER_PLUGIN_SPEC_PATH, 'w') as docker_plugin_spec_file:
+            docker_plugin_spec_file.write(generate_plugin_spec(socket_path))
+        # docker should not discover the tcp address of the same plugin
+        if os.path.isfile(DOCKER_PLUGIN_CONFIG_PATH):
+            os.remove(DOCKER_PLUGIN_CONFIG_PATH)
+
+
+def generate_etc_config(
+    block_device,
+    volume_group,
+    filestorage_mapping,
+    server_mode=SERVER_MODE,
+    workers=SERVER_WORKERS,
+    threads=SERVER_THREADS,
+    socket_path=SOCKET_PATH
+):
+    lines = [
         f'PHYSICAL_VOLUME={block_device}',
         f'VOLUME_GROUP={volume_group}',
         f'FILESTORAGE_MAPPING={filestorage_mapping}'
-    ])
+    ]
+    if server_mode == 'gunicorn':
+        lines.extend([
+            f'SERVER_MODE={server_mode}',
+            f'SERVER_WORKERS={workers}',
+            f'SERVER_THREADS={threads}'
+        ])
+    elif server_mode != 'flask':
+        lines.append(f'SERVER_MODE={server_mode}')
+    if socket_path is not None:
+        lines.append(f'LVMPY_SOCKET={socket_path}')
+    return '\n'.join(lines)
 
 
 def generate_config_files(
@@ -111,10 +158,7 @@ def generate_config_files(
 ):
     logger.info('Generating config files. Exec start [%s]', exec_start)
 
-    docker_plugin_config = generate_plugin_config(port=PORT)
-
-    with open(DOCKER_PLUGIN_CONFIG_PATH, 'w') as docker_plugin_config_file:
-        json.dump(docker_plugin_config, docker_plugin_config_file)
+    write_plugin_config(port=port)
 
     service_config = generate_systemd_service_config(
         exec_start=exec_start,
@@ -143,6 +187,7 @@ def setup(
     port=PORT
 ):
     stop_service(name=service_name)
+    remove_cron()
     load_btrfs_kernel_module()
     cleanup_volumes(
         block_device=block_device,
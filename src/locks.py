@@ -0,0 +1,172 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from .config import GENERATION_PATH, LOCK_DIR, MULTIPROCESS
+from .metrics import LOCK_WAIT
+
+# '+' is not allowed in volume names, so no volume shares the lock file
+GROUP_LOCK_NAME = '+group'
+
+
+class LockManager:
+    """ Locks keyed by volume name plus a volume group level lock.
+
+    Operations on different volumes run in parallel, only operations
+    changing the whole group (vgcreate, vgchange) take the group lock.
+    Volume locks are reentrant, e.g. mount may unmount the same volume.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: Dict[str, threading.RLock] = {}
+        self._users: Dict[str, int] = {}
+        self._group_lock = threading.RLock()
+
+    def _acquire_entry(self, name: str) -> threading.RLock:
+        with self._guard:
+            if name not in self._locks:
+                self._locks[name] = threading.RLock()
+                self._users[name] = 0
+            self._users[name] += 1
+            return self._locks[name]
+
+    def _release_entry(self, name: str) -> None:
+        with self._guard:
+            self._users[name] -= 1
+            if self._users[name] == 0:
+                del self._locks[name]
+                del self._users[name]
+
+    @contextmanager
+    def volume(self, name: str) -> Iterator[None]:
+        lock = self._acquire_entry(name)
+        try:
+            start = time.monotonic()
+            with lock:
+                LOCK_WAIT.observe(time.monotonic() - start, lock='volume')
+                yield
+        finally:
+            self._release_entry(name)
+
+    @contextmanager
+    def group(self) -> Iterator[None]:
+        start = time.monotonic()
+        with self._group_lock:
+            LOCK_WAIT.observe(time.monotonic() - start, lock='group')
+            yield
+
+    def active(self) -> List[str]:
+        """ Returns names of volumes that are locked or waited for """
+        with self._guard:
+            return list(self._locks)
+
+
+class FileLockManager(LockManager):
+    """ LockManager that also coordinates processes using flock.
+
+    The thread level lock is taken first, so only the outermost acquisition
+    in a process opens the lock file (flock is not reentrant across fds).
+    """
+
+    def __init__(self, lock_dir: str = LOCK_DIR):
+        super().__init__()
+        self.lock_dir = lock_dir
+        self._held: Dict[str, List[int]] = {}
+
+    @contextmanager
+    def _flock(self, name: str) -> Iterator[None]:
+        held = self._held.get(name)
+        if held is not None:
+            held[1] += 1
+        else:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            path = os.path.join(self.lock_dir, f'{name}.lock')
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            start = time.monotonic()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            LOCK_WAIT.observe(time.monotonic() - start, lock='file')
+            self._held[name] = held = [fd, 1]
+        try:
+            yield
+        finally:
+            held[1] -= 1
+            if held[1] == 0:
+                del self._held[name]
+                fcntl.flock(held[0], fcntl.LOCK_UN)
+                os.close(held[0])
+
+    @contextmanager
+    def volume(self, name: str) -> Iterator[None]:
+        with super().volume(name):
+            with self._flock(name):
+                yield
+
+    @contextmanager
+    def group(self) -> Iterator[None]:
+        with super().group():
+            with self._flock(GROUP_LOCK_NAME):
+                yield
+
+
+class Generation:
+    """ Change marker shared between processes through file mtime """
+
+    def __init__(self, path: str = GENERATION_PATH):
+        self.path = path
+
+    def current(self) -> int:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self) -> int:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        stamp = max(time.time_ns(), self.current() + 1)
+        with open(self.path, 'a'):
+            os.utime(self.path, ns=(stamp, stamp))
+        return self.current()
+
+
+class LocalGeneration(Generation):
+    """ Generation for single process mode, never changes externally """
+
+    def __init__(self):
+        super().__init__(path='')
+
+    def current(self) -> int:
+        return 0
+
+    def bump(self) -> int:
+        return 0
+
+
+if MULTIPROCESS:
+    locks = FileLockManager()
+    generation = Generation()
+else:
+    locks = LockManager()
+    generation = LocalGeneration()
@@ -17,10 +17,16 @@
 #   You should have received a copy of the GNU Affero General Public License
 #   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
 
-from src.app import run
+from src.config import SERVER_MODE
 
 
 def main():
+    if SERVER_MODE == 'async':
+        from src.aio import run
+    elif SERVER_MODE == 'gunicorn':
+        from src.wsgi import run
+    else:
+        from src.app import run
     run()
 
 
@@ -0,0 +1,326 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import METRICS_CACHE_TTL
+from .trace import CommandTrace, tracer
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+SECTOR_SIZE = 512
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for key, value in labels
+    )
+    return f'{{{pairs}}}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}'
+        ]
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        pass
+
+    def render(self) -> List[str]:
+        return self.header() + self.samples()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f'{self.name}{format_labels(labels)} {format_value(value)}'
+            for labels, value in values
+        ]
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f'{self.name}{format_labels(labels)} {format_value(value)}'
+            for labels, value in values
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # per labels: bucket counts, sum, count
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(tuple(sorted(labels.items())))
+        return entry[2] if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [
+                (labels, list(entry[0]), entry[1], entry[2])
+                for labels, entry in self._values.items()
+            ]
+        lines = []
+        for labels, counts, total, count in values:
+            for bound, bucket_count in zip(self.buckets, counts):
+                bucket_labels = labels + (('le', format_value(bound)),)
+                lines.append(
+                    f'{self.name}_bucket{format_labels(bucket_labels)} {bucket_count}'
+                )
+            lines.append(f'{self.name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {count}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'lvmpy_request_duration_seconds', 'Plugin api request latency'
+)
+COMMAND_DURATION = Histogram(
+    'lvmpy_command_duration_seconds', 'External command latency per attempt'
+)
+COMMANDS = Counter(
+    'lvmpy_commands_total', 'External command attempts by result'
+)
+COMMAND_RETRIES = Counter(
+    'lvmpy_command_retries_total', 'External command retries'
+)
+LOCK_WAIT = Histogram(
+    'lvmpy_lock_wait_seconds', 'Time spent waiting for volume and group locks'
+)
+
+WORKER_QUEUE_DEPTH = Gauge(
+    'lvmpy_worker_queue_depth', 'Filesystem tasks waiting for a worker'
+)
+WORKERS_BUSY = Gauge(
+    'lvmpy_workers_busy', 'Workers running filesystem tasks'
+)
+WORKER_REJECTED = Counter(
+    'lvmpy_worker_rejected_total', 'Filesystem tasks rejected by back-pressure'
+)
+
+METRICS = (
+    REQUEST_DURATION, COMMAND_DURATION, COMMANDS, COMMAND_RETRIES, LOCK_WAIT,
+    WORKER_QUEUE_DEPTH, WORKERS_BUSY, WORKER_REJECTED
+)
+
+
+def observe_trace(trace: CommandTrace) -> None:
+    COMMAND_DURATION.observe(trace.duration, command=trace.name)
+    status = 'success' if trace.returncode == 0 else 'failure'
+    COMMANDS.inc(command=trace.name, status=status)
+    if trace.attempt > 0:
+        COMMAND_RETRIES.inc(command=trace.name)
+
+
+def read_device_stat(device: str) -> Optional[List[int]]:
+    """ Returns /sys/block/<dm-N>/stat counters of the device mapper path """
+    block_name = os.path.basename(os.path.realpath(device))
+    try:
+        with open(os.path.join('/sys/block', block_name, 'stat')) as stat_file:
+            return [int(field) for field in stat_file.read().split()]
+    except (OSError, ValueError):
+        return None
+
+
+def gauge_lines(name: str, documentation: str, kind: str, samples: list) -> List[str]:
+    if not samples:
+        return []
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+    for labels, value in samples:
+        lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+    return lines
+
+
+class VolumeCollector:
+    """ Per-volume usage and io counters rendered at most once per ttl.
+
+    Volumes are those known to the process (cache or mount table), so
+    scraping does not query lvm; usage is read with statvfs and io
+    counters from sysfs on every collection.
+    """
+
+    def __init__(
+        self,
+        volumes: Callable[[], Dict[str, dict]],
+        device: Callable[[str], str],
+        ttl: int = METRICS_CACHE_TTL
+    ):
+        self.volumes = volumes
+        self.device = device
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._lines: List[str] = []
+        self._collected_at: Optional[float] = None
+
+    def collect(self) -> List[str]:
+        samples: Dict[Tuple[str, str, str], list] = {}
+
+        def add(name, documentation, kind, labels, value):
+            if value is not None:
+                samples.setdefault((name, documentation, kind), []).append(
+                    (labels, value)
+                )
+
+        for name, info in sorted(self.volumes().items()):
+            labels = (('volume', name),)
+            add('lvmpy_volume_size_bytes', 'Logical volume size', 'gauge',
+                labels, info.get('size'))
+            add('lvmpy_volume_data_percent', 'Thin volume data usage',
+                'gauge', labels, info.get('data_percent'))
+            add('lvmpy_volume_metadata_percent', 'Thin volume metadata usage',
+                'gauge', labels, info.get('metadata_percent'))
+            mountpoint = info.get('mountpoint')
+            if mountpoint:
+                try:
+                    stat = os.statvfs(mountpoint)
+                except OSError:
+                    logger.warning(f'Cannot stat {mountpoint}')
+                else:
+                    used = (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+                    add('lvmpy_volume_used_bytes', 'Used filesystem space',
+                        'gauge', labels, used)
+                    add('lvmpy_volume_available_bytes',
+                        'Available filesystem space', 'gauge', labels,
+                        stat.f_bavail * stat.f_frsize)
+            stat = read_device_stat(self.device(name))
+            if stat is not None and len(stat) >= 10:
+                add('lvmpy_volume_reads_total', 'Completed reads', 'counter',
+                    labels, stat[0])
+                add('lvmpy_volume_read_bytes_total', 'Bytes read', 'counter',
+                    labels, stat[2] * SECTOR_SIZE)
+                add('lvmpy_volume_writes_total', 'Completed writes', 'counter',
+                    labels, stat[4])
+                add('lvmpy_volume_written_bytes_total', 'Bytes written',
+                    'counter', labels, stat[6] * SECTOR_SIZE)
+                add('lvmpy_volume_io_seconds_total', 'Time spent doing io',
+                    'counter', labels, stat[9] / 1000)
+
+        lines = []
+        for (name, documentation, kind), values in samples.items():
+            lines.extend(gauge_lines(name, documentation, kind, values))
+        return lines
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            if self._collected_at is None or \
+                    time.monotonic() - self._collected_at > self.ttl:
+                try:
+                    self._lines = self.collect()
+                except Exception:
+                    logger.exception('Collecting volume metrics failed')
+                self._collected_at = time.monotonic()
+            return self._lines
+
+
+def render(collector: Optional[VolumeCollector] = None) -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    if collector is not None:
+        lines.extend(collector.lines())
+    return '\n'.join(lines) + '\n'
+
+
+tracer.subscribe(observe_trace)
@@ -0,0 +1,102 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+from typing import List, NamedTuple, Optional, Tuple
+
+from .report import parse_size
+
+METADATA_PROFILES = ('single', 'dup')
+FEATURES = (
+    'no-holes', 'free-space-tree', 'block-group-tree', 'extref',
+    'skinny-metadata', 'raid1c34'
+)
+MIN_NODESIZE = 4096
+MAX_NODESIZE = 65536
+
+
+class FormatOptions(NamedTuple):
+    # None discards thick volumes only: a new thick volume may reuse
+    # extents freed by removed volumes, a new thin volume has no blocks
+    nodiscard: Optional[bool] = None
+    metadata: Optional[str] = None
+    nodesize: Optional[int] = None
+    features: Tuple[str, ...] = ()
+
+
+DEFAULT_FORMAT_OPTIONS = FormatOptions()
+
+
+def parse_nodesize(value: str) -> int:
+    nodesize = parse_size(value)
+    if nodesize is None or nodesize & (nodesize - 1) or \
+            not MIN_NODESIZE <= nodesize <= MAX_NODESIZE:
+        raise ValueError(
+            f'Invalid nodesize {value}, expected power of two '
+            f'from {MIN_NODESIZE} to {MAX_NODESIZE} bytes'
+        )
+    return nodesize
+
+
+def parse_features(value: str) -> Tuple[str, ...]:
+    features = tuple(filter(None, (f.strip() for f in value.split(','))))
+    for feature in features:
+        if feature.lstrip('^') not in FEATURES:
+            raise ValueError(
+                f'Unsupported feature {feature}, expected one of {FEATURES}'
+            )
+    return features
+
+
+def parse_format_options(options: dict) -> FormatOptions:
+    """ Builds mkfs options from VolumeDriver.Create Opts """
+    nodiscard = options.get('nodiscard')
+    if nodiscard not in (None, 'true', 'false'):
+        raise ValueError(f'Invalid nodiscard {nodiscard}, expected true or false')
+    metadata = options.get('metadata')
+    if metadata is not None and metadata not in METADATA_PROFILES:
+        raise ValueError(
+            f'Invalid metadata profile {metadata}, expected one of {METADATA_PROFILES}'
+        )
+    nodesize = options.get('nodesize')
+    features = options.get('features')
+    return FormatOptions(
+        nodiscard=None if nodiscard is None else nodiscard == 'true',
+        metadata=metadata,
+        nodesize=parse_nodesize(nodesize) if nodesize else None,
+        features=parse_features(features) if features else ()
+    )
+
+
+def mkfs_cmd(
+    device: str,
+    options: FormatOptions = DEFAULT_FORMAT_OPTIONS,
+    thin: bool = False
+) -> List[str]:
+    cmd = ['mkfs.btrfs', '-f']
+    nodiscard = thin if options.nodiscard is None else options.nodiscard
+    if nodiscard:
+        cmd.append('-K')
+    if options.metadata:
+        cmd.extend(['-m', options.metadata])
+    if options.nodesize:
+        cmd.extend(['-n', str(options.nodesize)])
+    if options.features:
+        cmd.extend(['-O', ','.join(options.features)])
+    cmd.append(device)
+    return cmd
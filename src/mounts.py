@@ -0,0 +1,138 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import os
+import re
+import select
+import threading
+from typing import Dict, List, NamedTuple, Optional, TextIO
+
+MOUNTINFO_PATH = '/proc/self/mountinfo'
+ESCAPE_RE = re.compile(r'\\([0-7]{3})')
+
+
+class Mount(NamedTuple):
+    device: str  # major:minor
+    root: str
+    mountpoint: str
+    fstype: str
+    source: str
+
+
+def unescape(field: str) -> str:
+    """ Decodes octal escapes (e.g. \\040 for space) used in mountinfo """
+    return ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+
+def parse_mountinfo(content: str) -> List[Mount]:
+    mounts = []
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        fields = line.split()
+        separator = fields.index('-', 6)
+        mounts.append(Mount(
+            device=fields[2],
+            root=unescape(fields[3]),
+            mountpoint=unescape(fields[4]),
+            fstype=fields[separator + 1],
+            source=unescape(fields[separator + 2])
+        ))
+    return mounts
+
+
+def device_path(source: str) -> str:
+    """ Resolves device symlinks, btrfs may report /dev/dm-N as a source
+    of a volume that is known as /dev/mapper/<vg>-<lv> """
+    if source.startswith('/dev/'):
+        return os.path.realpath(source)
+    return source
+
+
+class MountTable:
+    """ In-memory index of mounts parsed from mountinfo.
+
+    The file is parsed again only after the kernel reports a change
+    of the mount table through poll (POLLPRI/POLLERR on the open file).
+    The poll event and the read offset belong to the open file, so every
+    process (e.g. a forked gunicorn worker) opens the file on its own.
+    """
+
+    def __init__(self, path: str = MOUNTINFO_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._file: Optional[TextIO] = None
+        self._poller = select.poll()
+        self._by_source: Dict[str, List[Mount]] = {}
+        self._by_mountpoint: Dict[str, Mount] = {}
+        self._loaded = False
+
+    def _open(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path)
+        self._poller = select.poll()
+        self._poller.register(self._file, select.POLLPRI | select.POLLERR)
+        self._pid = os.getpid()
+        self._loaded = False
+
+    def _changed(self) -> bool:
+        return bool(self._poller.poll(0))
+
+    def _reload(self) -> None:
+        self._file.seek(0)
+        mounts = parse_mountinfo(self._file.read())
+        self._by_source, self._by_mountpoint = {}, {}
+        for mount in mounts:
+            self._by_source.setdefault(
+                device_path(mount.source), []
+            ).append(mount)
+            # the last mount on the path hides previous ones
+            self._by_mountpoint[mount.mountpoint] = mount
+        self._loaded = True
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            if force or not self._loaded or self._changed():
+                self._reload()
+
+    def mounts(self, source: str) -> List[Mount]:
+        self.refresh()
+        return list(self._by_source.get(device_path(source), []))
+
+    def mount(self, mountpoint: str) -> Optional[Mount]:
+        self.refresh()
+        return self._by_mountpoint.get(os.path.normpath(mountpoint))
+
+    def is_mounted(self, mountpoint: str) -> bool:
+        return self.mount(mountpoint) is not None
+
+    def under(self, prefix: str) -> List[Mount]:
+        """ Returns visible mounts with mountpoints starting with prefix """
+        self.refresh()
+        return [
+            mount for path, mount in self._by_mountpoint.items()
+            if path.startswith(prefix)
+        ]
+
+
+mount_table = MountTable()
@@ -0,0 +1,190 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import logging
+import re
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+from .config import VOLUME_GROUP, WARM_POOL_INTERVAL, WARM_POOL_SIZES
+from .core import (
+    LvmPyError,
+    run_lvm,
+    volume_cache,
+    volume_device
+)
+from .locks import locks
+from .mkfs import mkfs_cmd
+from .report import (
+    LV_FIELDS,
+    LogicalVolume,
+    parse_size,
+    parse_volumes,
+    report_cmd
+)
+from .trace import tracer
+
+logger = logging.getLogger(__name__)
+
+
+READY_PREFIX = 'warm+'
+PREPARING_PREFIX = 'prep+'
+FILL_LOCK_NAME = 'warm+pool'
+# snapshots are named volume+snapshot, so pool volumes are matched exactly
+POOL_NAME_RE = re.compile(r'^(warm|prep)\+\d+\+[0-9a-f]{8}$')
+
+
+def parse_pool_sizes(sizes: str) -> Dict[int, int]:
+    """ Parses `size:count` pairs separated by commas """
+    pool_sizes = {}
+    for item in filter(None, sizes.split(',')):
+        size, _, count = item.partition(':')
+        size_bytes = parse_size(size)
+        if size_bytes is None:
+            raise ValueError(f'Invalid warm pool size {size}')
+        pool_sizes[size_bytes] = int(count or 1)
+    return pool_sizes
+
+
+def pool_volume_size(name: str) -> int:
+    return int(name.split('+')[1])
+
+
+class WarmPool(threading.Thread):
+    """ Keeps pre-created and formatted volumes of the configured sizes.
+
+    Create takes a ready volume by renaming it, so the request does not
+    wait for lvcreate and mkfs. Volumes are prepared under `prep+` names
+    and renamed to `warm+` only when formatted. The pool is refilled
+    every `interval` seconds and after each take.
+    """
+
+    def __init__(
+        self,
+        sizes: Dict[int, int],
+        group: str = VOLUME_GROUP,
+        interval: int = WARM_POOL_INTERVAL
+    ):
+        super().__init__(name='warm-pool', daemon=True)
+        self.sizes = sizes
+        self.group = group
+        self.interval = interval
+        self.last_error: Optional[Exception] = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sizes)
+
+    def pooled(self) -> List[LogicalVolume]:
+        stdout = run_lvm(report_cmd('lvs', LV_FIELDS, f'vg_name={self.group}'))
+        return [
+            lv for lv in parse_volumes(stdout)
+            if POOL_NAME_RE.match(lv.name)
+        ]
+
+    def ready(self, size: int) -> List[str]:
+        return [
+            lv.name for lv in self.pooled()
+            if lv.name.startswith(READY_PREFIX) and
+            pool_volume_size(lv.name) == size
+        ]
+
+    def take(self, name: str, size: str) -> bool:
+        """ Renames a ready volume of the size to name if there is one """
+        size_bytes = parse_size(size)
+        if size_bytes not in self.sizes:
+            return False
+        with locks.group():
+            ready = self.ready(size_bytes)
+            if not ready:
+                logger.info(f'No warm volume of {size_bytes}b for {name}')
+                self.trigger()
+                return False
+            try:
+                run_lvm(['lvrename', self.group, ready[0], name], retries=1)
+            except LvmPyError as e:
+                logger.warning(f'Taking warm volume {ready[0]} failed: {e}')
+                return False
+        logger.info(f'Volume {name} was created from warm volume {ready[0]}')
+        volume_cache.add(name, size=size_bytes)
+        self.trigger()
+        return True
+
+    def remove_volume(self, name: str) -> None:
+        run_lvm(['lvremove', '-f', f'{self.group}/{name}'])
+
+    def prepare(self, size: int) -> None:
+        suffix = f'{size}+{uuid.uuid4().hex[:8]}'
+        name = f'{PREPARING_PREFIX}{suffix}'
+        logger.info(f'Preparing warm volume {name}')
+        run_lvm(['lvcreate', '-L', f'{size}b', '-n', name, self.group])
+        res = tracer.run(mkfs_cmd(volume_device(name)))
+        if res.returncode != 0:
+            stderr = res.stderr.decode('utf-8')
+            self.remove_volume(name)
+            raise LvmPyError(f'Formatting warm volume failed with {stderr}')
+        run_lvm(['lvrename', self.group, name, f'{READY_PREFIX}{suffix}'])
+
+    def fill(self) -> None:
+        # only one process fills the pool, so preparing volumes that are
+        # seen here were left by a crashed run
+        with locks.volume(FILL_LOCK_NAME):
+            pooled = self.pooled()
+            for lv in pooled:
+                if lv.name.startswith(PREPARING_PREFIX):
+                    logger.warning(f'Removing stale warm volume {lv.name}')
+                    self.remove_volume(lv.name)
+            for size, count in self.sizes.items():
+                ready = sum(
+                    1 for lv in pooled
+                    if lv.name.startswith(READY_PREFIX) and
+                    pool_volume_size(lv.name) == size
+                )
+                for _ in range(count - ready):
+                    self.prepare(size)
+
+    def check(self) -> bool:
+        try:
+            self.fill()
+        except Exception as e:
+            logger.exception('Warm pool refill failed')
+            self.last_error = e
+            return False
+        self.last_error = None
+        return True
+
+    def trigger(self) -> None:
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run(self) -> None:
+        logger.info(f'Starting warm pool {self.sizes}, interval {self.interval}s')
+        while not self._stopped.is_set():
+            self.check()
+            self._wakeup.wait(timeout=self.interval)
+            self._wakeup.clear()
+
+
+warm_pool = WarmPool(sizes=parse_pool_sizes(WARM_POOL_SIZES))
@@ -0,0 +1,184 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import os
+import re
+import stat
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+PROC_DIR = '/proc'
+CONTAINER_ID_RE = re.compile(r'(?:docker[-/]|containerd[-/])([0-9a-f]{64})')
+
+
+class ProcessInfo(NamedTuple):
+    pid: int
+    name: str
+    cmdline: str
+    container: Optional[str]
+
+
+def pids(proc_dir: str = PROC_DIR) -> Iterator[int]:
+    for entry in os.listdir(proc_dir):
+        if entry.isdigit():
+            yield int(entry)
+
+
+def dev_id(dev: int) -> str:
+    """ Formats device number as in mountinfo (major:minor) """
+    return f'{os.major(dev)}:{os.minor(dev)}'
+
+
+def maps_dev_id(dev: str) -> str:
+    """ Converts hex device of /proc/<pid>/maps (fd:04) to major:minor """
+    major, minor = dev.split(':')
+    return f'{int(major, 16)}:{int(minor, 16)}'
+
+
+def mountinfo_devices(path: str) -> Set[str]:
+    """ Returns major:minor of filesystems mounted in the namespace """
+    with open(path) as mountinfo:
+        return {line.split()[2] for line in mountinfo if line.strip()}
+
+
+def read_proc_file(pid: int, name: str, proc_dir: str = PROC_DIR) -> str:
+    try:
+        with open(os.path.join(proc_dir, str(pid), name), 'rb') as f:
+            return f.read().decode('utf-8', 'replace')
+    except OSError:
+        return ''
+
+
+def process_info(pid: int, proc_dir: str = PROC_DIR) -> ProcessInfo:
+    cmdline = read_proc_file(pid, 'cmdline', proc_dir).replace('\0', ' ')
+    container = CONTAINER_ID_RE.search(read_proc_file(pid, 'cgroup', proc_dir))
+    return ProcessInfo(
+        pid=pid,
+        name=read_proc_file(pid, 'comm', proc_dir).strip(),
+        cmdline=cmdline.strip(),
+        container=container.group(1)[:12] if container else None
+    )
+
+
+class ConsumerIndex:
+    """ Device and file usage of all processes collected in one /proc pass.
+
+    Open fds, cwd, root and memory mapped files are indexed by device
+    (major:minor) and by (device, inode). Mount namespaces other than our
+    own are indexed by the devices mounted in them, so processes in
+    containers holding a bind mount of the volume are found as well.
+    """
+
+    def __init__(self, proc_dir: str = PROC_DIR):
+        self.proc_dir = proc_dir
+        self.by_device: Dict[str, Dict[int, Set[str]]] = {}
+        self.by_inode: Dict[Tuple[int, int], Set[int]] = {}
+        self.namespaces: Dict[str, Tuple[Set[str], Set[int]]] = {}
+        self._own_namespace = os.readlink(
+            os.path.join(proc_dir, 'self', 'ns', 'mnt')
+        )
+
+    def _add(self, pid: int, st: os.stat_result, reason: str) -> None:
+        self._add_device(pid, dev_id(st.st_dev), reason)
+        self.by_inode.setdefault((st.st_dev, st.st_ino), set()).add(pid)
+        if stat.S_ISBLK(st.st_mode):
+            self._add_device(pid, dev_id(st.st_rdev), reason)
+
+    def _add_device(self, pid: int, device: str, reason: str) -> None:
+        self.by_device.setdefault(device, {}).setdefault(pid, set()).add(reason)
+
+    def _scan_links(self, pid: int, pid_dir: str) -> None:
+        fd_dir = os.path.join(pid_dir, 'fd')
+        links = [('fd', os.path.join(fd_dir, fd)) for fd in os.listdir(fd_dir)]
+        links += [('cwd', os.path.join(pid_dir, 'cwd')),
+                  ('root', os.path.join(pid_dir, 'root'))]
+        for reason, link in links:
+            try:
+                self._add(pid, os.stat(link), reason)
+            except OSError:
+                continue
+
+    def _scan_maps(self, pid: int, pid_dir: str) -> None:
+        with open(os.path.join(pid_dir, 'maps')) as maps:
+            for line in maps:
+                fields = line.split(maxsplit=5)
+                if len(fields) < 6 or fields[4] == '0':  # anonymous mapping
+                    continue
+                self._add_device(pid, maps_dev_id(fields[3]), 'maps')
+
+    def _scan_namespace(self, pid: int, pid_dir: str) -> None:
+        namespace = os.readlink(os.path.join(pid_dir, 'ns', 'mnt'))
+        if namespace == self._own_namespace:
+            return
+        if namespace not in self.namespaces:
+            devices = mountinfo_devices(os.path.join(pid_dir, 'mountinfo'))
+            self.namespaces[namespace] = (devices, set())
+        self.namespaces[namespace][1].add(pid)
+
+    def scan(self) -> 'ConsumerIndex':
+        for pid in pids(self.proc_dir):
+            pid_dir = os.path.join(self.proc_dir, str(pid))
+            try:
+                self._scan_links(pid, pid_dir)
+                self._scan_maps(pid, pid_dir)
+                self._scan_namespace(pid, pid_dir)
+            except (FileNotFoundError, ProcessLookupError, PermissionError):
+                # process exited during the scan or is not accessible
+                continue
+        return self
+
+    def device_users(self, devices: Iterable[str]) -> Dict[int, Set[str]]:
+        users: Dict[int, Set[str]] = {}
+        devices = set(devices)
+        for device in devices:
+            for pid, reasons in self.by_device.get(device, {}).items():
+                users.setdefault(pid, set()).update(reasons)
+        for mounted, namespace_pids in self.namespaces.values():
+            if devices & mounted:
+                for pid in namespace_pids:
+                    users.setdefault(pid, set()).add('mountinfo')
+        return users
+
+    def path_users(self, path: str) -> List[int]:
+        """ Processes using the path, like fuser without options """
+        st = os.stat(path)
+        if stat.S_ISBLK(st.st_mode):
+            return sorted(self.by_device.get(dev_id(st.st_rdev), {}))
+        return sorted(self.by_inode.get((st.st_dev, st.st_ino), set()))
+
+
+def volume_devices(device: str, mountpoint: str) -> List[str]:
+    """ Returns ids of the block device and the filesystem mounted from it """
+    devices = []
+    try:
+        devices.append(dev_id(os.stat(device).st_rdev))
+    except OSError:
+        pass
+    if os.path.ismount(mountpoint):
+        devices.append(dev_id(os.stat(mountpoint).st_dev))
+    return devices
+
+
+def find_consumers(
+    device: str,
+    mountpoint: str,
+    proc_dir: str = PROC_DIR
+) -> Dict[int, Set[str]]:
+    """ Finds processes using the volume, returns pid to usage reasons """
+    index = ConsumerIndex(proc_dir=proc_dir).scan()
+    return index.device_users(volume_devices(device, mountpoint))
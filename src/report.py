@@ -0,0 +1,182 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import json
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+PV_FIELDS = ('pv_name', 'vg_name')
+LV_FIELDS = (
+    'lv_name', 'vg_name', 'lv_size', 'lv_attr', 'lv_active', 'devices',
+    'pool_lv', 'data_percent', 'metadata_percent', 'lv_metadata_size'
+)
+# Requesting pv and lv fields together makes lvm report physical volume
+# segments, so every pv, vg and lv appears in the output of a single call
+STATE_FIELDS = PV_FIELDS + (
+    'lv_name', 'lv_size', 'lv_attr', 'lv_active', 'devices'
+)
+SIZE_UNITS = {'': 1, 'k': 2 ** 10, 'm': 2 ** 20, 'g': 2 ** 30, 't': 2 ** 40}
+SIZE_RE = re.compile(r'^(\d+)([kmgt]?)b?$')
+
+
+class PhysicalVolume(NamedTuple):
+    name: str
+    vg: str
+
+
+class LogicalVolume(NamedTuple):
+    name: str
+    vg: str
+    size: int
+    attr: str
+    active: bool
+    devices: Tuple[str, ...]
+    pool: str = ''
+    data_percent: Optional[float] = None
+    metadata_percent: Optional[float] = None
+    metadata_size: int = 0
+
+    @property
+    def hidden(self) -> bool:
+        # internal volumes (e.g. pool metadata) are reported in brackets
+        return self.name.startswith('[')
+
+    @property
+    def internal(self) -> bool:
+        # '+' is not allowed in docker volume names, lvmpy uses it to name
+        # the volumes it manages itself (e.g. warm pool)
+        return '+' in self.name
+
+    @property
+    def thin_pool(self) -> bool:
+        return self.attr.startswith('t')
+
+    @property
+    def thin(self) -> bool:
+        return self.attr.startswith('V')
+
+    @property
+    def activation_skip(self) -> bool:
+        # vgchange -ay leaves such volumes (e.g. thin snapshots) inactive
+        return self.attr[9:10] == 'k'
+
+
+class LvmState(NamedTuple):
+    physical_volumes: List[PhysicalVolume]
+    logical_volumes: List[LogicalVolume]
+
+    def volume_groups(self) -> List[str]:
+        groups = (pv.vg for pv in self.physical_volumes if pv.vg)
+        return list(dict.fromkeys(groups))
+
+    def group_physical_volumes(self, group: str) -> List[str]:
+        return [pv.name for pv in self.physical_volumes if pv.vg == group]
+
+    def group_volumes(self, group: str) -> List[LogicalVolume]:
+        return [lv for lv in self.logical_volumes if lv.vg == group]
+
+
+def parse_size(size: str) -> Optional[int]:
+    """ Converts lvm size string (256m, 1g, 1024b) to bytes """
+    match = SIZE_RE.match(size.strip().lower())
+    if match is None:
+        return None
+    number, unit = match.groups()
+    return int(number) * SIZE_UNITS[unit]
+
+
+def report_cmd(
+    command: str,
+    fields: Tuple[str, ...],
+    selection: Optional[str] = None
+) -> List[str]:
+    cmd = [
+        command, '--reportformat', 'json', '--units', 'b', '--nosuffix',
+        '-o', ','.join(fields)
+    ]
+    if selection:
+        cmd.extend(['-S', selection])
+    return cmd
+
+
+def parse_rows(output: str) -> List[Dict[str, str]]:
+    """ Returns rows of all sections of lvm json report """
+    if not output.strip():
+        return []
+    rows = []
+    for section in json.loads(output).get('report', []):
+        for section_rows in section.values():
+            rows.extend(section_rows)
+    return rows
+
+
+def parse_percent(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    return float(value)
+
+
+def parse_logical_volumes(rows: List[Dict[str, str]]) -> List[LogicalVolume]:
+    """ Merges lv rows (one per segment) into logical volume records """
+    volumes: Dict[Tuple[str, str], LogicalVolume] = {}
+    for row in rows:
+        name, vg = row.get('lv_name'), row.get('vg_name', '')
+        if not name:  # free physical volume segment
+            continue
+        devices = tuple(filter(None, row.get('devices', '').split(',')))
+        key = (vg, name)
+        if key in volumes:
+            lv = volumes[key]
+            volumes[key] = lv._replace(devices=lv.devices + devices)
+            continue
+        active = row.get('lv_active', '')
+        volumes[key] = LogicalVolume(
+            name=name,
+            vg=vg,
+            size=int(row.get('lv_size') or 0),
+            attr=row.get('lv_attr', ''),
+            active=bool(active) and active != 'inactive',
+            devices=devices,
+            pool=row.get('pool_lv', ''),
+            data_percent=parse_percent(row.get('data_percent')),
+            metadata_percent=parse_percent(row.get('metadata_percent')),
+            metadata_size=int(row.get('lv_metadata_size') or 0)
+        )
+    return list(volumes.values())
+
+
+def parse_physical_volumes(rows: List[Dict[str, str]]) -> List[PhysicalVolume]:
+    pvs = {
+        row['pv_name']: PhysicalVolume(row['pv_name'], row.get('vg_name', ''))
+        for row in rows
+    }
+    return list(pvs.values())
+
+
+def parse_state(output: str) -> LvmState:
+    rows = parse_rows(output)
+    return LvmState(
+        physical_volumes=parse_physical_volumes(rows),
+        logical_volumes=parse_logical_volumes(rows)
+    )
+
+
+def parse_volumes(output: str) -> List[LogicalVolume]:
+    return parse_logical_volumes(parse_rows(output))
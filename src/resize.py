@@ -0,0 +1,64 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import sys
+
+from .core import LvmPyError, resize_many
+from .log import init_logging
+
+
+def parse_args(args: list) -> dict:
+    sizes = {}
+    for arg in args:
+        name, sep, size = arg.partition('=')
+        if not sep or not name or not size:
+            raise ValueError(f'Invalid argument {arg}, expected NAME=SIZE')
+        sizes[name] = size
+    return sizes
+
+
+# Volume locks of this process are shared with the daemon only in gunicorn
+# mode (file locks, SERVER_MODE=gunicorn in the environment). With flask or
+# aio servers stop the docker-lvmpy service first, or use the
+# /VolumeDriver.Resize route of the running daemon instead.
+USAGE = 'Usage: resize NAME=SIZE [NAME=SIZE ...], stop the daemon ' \
+    'unless it runs in gunicorn mode'
+
+
+def main():
+    init_logging()
+    try:
+        sizes = parse_args(sys.argv[1:])
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        print(USAGE, file=sys.stderr)
+        exit(1)
+    if not sizes:
+        print(USAGE, file=sys.stderr)
+        exit(1)
+    try:
+        resize_many(sizes)
+    except LvmPyError as err:
+        print(f'Resize failed with error: {err}', file=sys.stderr)
+        exit(2)
+    print('Volumes were resized')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from .config import RETRY_MAX_DELAY
+from .trace import is_lvm_command
+
+LOCKED = 'locked'
+BUSY = 'busy'
+NOT_FOUND = 'not-found'
+EXISTS = 'exists'
+UNKNOWN = 'unknown'
+
+# Checked in order, the first class with a matching pattern wins
+ERROR_PATTERNS = (
+    (LOCKED, (
+        "can't get lock", 'could not lock', 'failed to lock',
+        'lock timeout', 'resource temporarily unavailable'
+    )),
+    (EXISTS, ('already exists', 'already mounted')),
+    (NOT_FOUND, (
+        'not found', 'failed to find', "can't find", 'no such',
+        'does not exist', 'not mounted', "can't open"
+    )),
+    (BUSY, ('busy', 'in use', 'open count')),
+)
+# A missing device outside of lvm may be a node that udev has not created
+# yet after lvcreate or lvrename, so mount and mkfs keep retrying it
+COMMAND_NOT_FOUND_PATTERNS = ('not mounted',)
+# Unknown errors are retried as before, only known deterministic
+# failures fail fast
+RETRYABLE = (LOCKED, BUSY, UNKNOWN)
+
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+
+def classify(stderr: str, command: Optional[str] = None) -> str:
+    """ Classifies an error of the command (lvm if it is not given) """
+    text = stderr.lower()
+    for error_class, patterns in ERROR_PATTERNS:
+        if error_class == NOT_FOUND and command is not None and \
+                not is_lvm_command(command):
+            patterns = COMMAND_NOT_FOUND_PATTERNS
+        if any(pattern in text for pattern in patterns):
+            return error_class
+    return UNKNOWN
+
+
+def is_retryable(error_class: str) -> bool:
+    return error_class in RETRYABLE
+
+
+def backoff(timeout: float, max_delay: float = RETRY_MAX_DELAY) -> float:
+    """ Caps the timeout and picks a random delay from its upper half """
+    cap = min(timeout, max_delay)
+    return cap / 2 + random.uniform(0, cap / 2)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """ Limits the time all retries inside the context can take """
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def set_deadline(seconds: float) -> None:
+    _deadline.set(time.monotonic() + seconds)
+
+
+def clear_deadline() -> None:
+    _deadline.set(None)
+
+
+def remaining() -> Optional[float]:
+    """ Returns seconds left before the deadline or None if it is not set """
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def can_wait(delay: float) -> bool:
+    left = remaining()
+    return left is None or left >= delay
+
+
+def next_delay(
+    error_class: str,
+    attempt: int,
+    timeouts: List[float]
+) -> Optional[float]:
+    """ Returns sleep before the next attempt or None to stop retrying """
+    if not is_retryable(error_class) or attempt + 1 >= len(timeouts):
+        return None
+    delay = backoff(timeouts[attempt])
+    if not can_wait(delay):
+        return None
+    return delay
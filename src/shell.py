@@ -0,0 +1,202 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import json
+import logging
+import os
+import selectors
+import shlex
+import subprocess
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from .config import LVM_SHELL_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+PROMPT = b'lvm> '
+READ_CHUNK_SIZE = 65536
+START_TIMEOUT = 10
+RESTART_DELAY = 60
+# lvm reports 1 (ECMD_PROCESSED) as return code of successful command
+LVM_SUCCESS_CODE = 1
+COMMAND_LOG_CONFIG = 'log/report_command_log=1 log/command_log_selection="all"'
+
+
+class LvmShellError(Exception):
+    pass
+
+
+class LvmShellCommandError(LvmShellError):
+    pass
+
+
+class LvmShell:
+    """ Long-lived `lvm` shell co-process.
+
+    Commands are written to the shell stdin one per line. Data and command
+    log reports are read as json from a dedicated pipe (LVM_REPORT_FD),
+    the shell prompt on stdout marks the end of the command output.
+    """
+
+    def __init__(self, binary: str = 'lvm', timeout: int = LVM_SHELL_TIMEOUT):
+        self.binary = binary
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self._report_fd: Optional[int] = None
+        self._owner_pid: Optional[int] = None
+        self._disabled_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and \
+            self._owner_pid == os.getpid() and \
+            self.process.poll() is None
+
+    def start(self) -> None:
+        read_fd, write_fd = os.pipe()
+        env = {**os.environ, 'LC_ALL': 'C', 'LVM_REPORT_FD': str(write_fd)}
+        try:
+            self.process = subprocess.Popen(
+                [self.binary],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                pass_fds=(write_fd,),
+                env=env
+            )
+        except OSError as e:
+            os.close(read_fd)
+            raise LvmShellError(f'Lvm shell cannot be started: {e}')
+        finally:
+            os.close(write_fd)
+        self._report_fd = read_fd
+        self._owner_pid = os.getpid()
+        for fd in self._fds():
+            os.set_blocking(fd, False)
+        try:
+            self._read_until_prompt(timeout=START_TIMEOUT)
+        except LvmShellError:
+            self.stop()
+            # do not pay startup timeout on every command if shell is broken
+            self._disabled_until = time.monotonic() + RESTART_DELAY
+            raise
+        logger.info('Lvm shell started, pid %d', self.process.pid)
+
+    def stop(self) -> None:
+        if self.process is not None and self._owner_pid == os.getpid():
+            logger.info('Stopping lvm shell, pid %d', self.process.pid)
+            self.process.kill()
+            self.process.wait()
+            os.close(self._report_fd)
+        self.process, self._report_fd, self._owner_pid = None, None, None
+
+    def _fds(self) -> List[int]:
+        return [
+            self.process.stdout.fileno(),
+            self.process.stderr.fileno(),
+            self._report_fd
+        ]
+
+    def _read_until_prompt(
+        self,
+        timeout: Optional[int] = None
+    ) -> Tuple[str, str, str]:
+        """ Returns stdout, stderr and report output of the command """
+        fds = self._fds()
+        stdout_fd = fds[0]
+        buffers = {fd: b'' for fd in fds}
+        deadline = time.monotonic() + (timeout or self.timeout)
+        with selectors.DefaultSelector() as selector:
+            for fd in buffers:
+                selector.register(fd, selectors.EVENT_READ)
+            while not buffers[stdout_fd].endswith(PROMPT):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LvmShellError('Lvm shell response timed out')
+                for key, _ in selector.select(timeout=remaining):
+                    chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                    if not chunk:
+                        raise LvmShellError('Lvm shell exited')
+                    buffers[key.fd] += chunk
+            # reports are written before the prompt is printed
+            for key, _ in selector.select(timeout=0):
+                try:
+                    while chunk := os.read(key.fd, READ_CHUNK_SIZE):
+                        buffers[key.fd] += chunk
+                except BlockingIOError:
+                    pass
+        buffers[stdout_fd] = buffers[stdout_fd][:-len(PROMPT)]
+        stdout, stderr, report = (buffers[fd].decode('utf-8') for fd in fds)
+        return stdout, stderr, report
+
+    def execute(self, cmd: List[str]) -> str:
+        with self._lock:
+            if time.monotonic() < self._disabled_until:
+                raise LvmShellError('Lvm shell is disabled after failure')
+            if not self.is_alive():
+                if self.process is not None:
+                    self.restarts += 1
+                    logger.warning('Lvm shell is not running. Restarting')
+                self.stop()
+                self.start()
+            line = ' '.join(map(shlex.quote, [
+                *cmd, '--reportformat', 'json', '--config', COMMAND_LOG_CONFIG
+            ]))
+            try:
+                self.process.stdin.write(f'{line}\n'.encode('utf-8'))
+                self.process.stdin.flush()
+                stdout, stderr, report = self._read_until_prompt()
+            except (OSError, LvmShellError) as e:
+                self.stop()
+                raise LvmShellError(f'Lvm shell failed: {e}')
+
+        code = self._return_code(report)
+        if code != LVM_SUCCESS_CODE:
+            errors = ' '.join([stderr.strip(), *self._error_messages(report)])
+            raise LvmShellCommandError(
+                f'Command [{" ".join(cmd)}] returned {code}, error: {errors.strip()}'
+            )
+        return report or stdout
+
+    @staticmethod
+    def _return_code(report: str) -> Optional[int]:
+        if not report.strip():
+            return None
+        log = json.loads(report).get('log', [])
+        statuses = [
+            int(item['log_ret_code'])
+            for item in log
+            if item.get('log_type') == 'status'
+            and item.get('log_object_type') == 'cmd'
+        ]
+        return statuses[-1] if statuses else None
+
+    @staticmethod
+    def _error_messages(report: str) -> List[str]:
+        # with command log reporting errors are not printed to stderr
+        if not report.strip():
+            return []
+        return [
+            item.get('log_message', '')
+            for item in json.loads(report).get('log', [])
+            if item.get('log_type') == 'error'
+        ]
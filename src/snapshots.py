@@ -0,0 +1,194 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import logging
+import os
+import re
+from typing import List, NamedTuple
+
+from .config import VOLUME_GROUP
+from .core import (
+    LvmPyError,
+    logical_volume,
+    mounted,
+    run_cmd,
+    run_lvm,
+    volume_cache,
+    volume_device
+)
+from .locks import locks
+from .report import LV_FIELDS, parse_volumes, report_cmd
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOTS_DIR = '.snapshots'
+SUBVOLUME = 'subvolume'
+LVM = 'lvm'
+SNAPSHOT_TYPES = (SUBVOLUME, LVM)
+SNAPSHOT_NAME_RE = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9_.-]*$')
+
+
+class Snapshot(NamedTuple):
+    name: str
+    volume: str
+    type: str
+
+
+def validate_snapshot_name(snapshot: str) -> None:
+    if not SNAPSHOT_NAME_RE.match(snapshot):
+        raise LvmPyError(f'Invalid snapshot name {snapshot}')
+
+
+def snapshot_volume_name(volume: str, snapshot: str) -> str:
+    # '+' can't appear in docker volume names, snapshots are not listed
+    return f'{volume}+{snapshot}'
+
+
+def create_subvolume_snapshot(
+    volume: str,
+    snapshot: str,
+    readonly: bool = False
+) -> None:
+    """ Snapshots volume top level subvolume into .snapshots/<snapshot> """
+    validate_snapshot_name(snapshot)
+    with locks.volume(volume), mounted(volume) as mountpoint:
+        snapshots_dir = os.path.join(mountpoint, SNAPSHOTS_DIR)
+        os.makedirs(snapshots_dir, exist_ok=True)
+        cmd = ['btrfs', 'subvolume', 'snapshot']
+        if readonly:
+            cmd.append('-r')
+        cmd.extend([mountpoint, os.path.join(snapshots_dir, snapshot)])
+        run_cmd(cmd, retries=1)
+
+
+def list_subvolume_snapshots(volume: str) -> List[Snapshot]:
+    with locks.volume(volume), mounted(volume) as mountpoint:
+        snapshots_dir = os.path.join(mountpoint, SNAPSHOTS_DIR)
+        if not os.path.isdir(snapshots_dir):
+            return []
+        return [
+            Snapshot(name, volume, SUBVOLUME)
+            for name in sorted(os.listdir(snapshots_dir))
+        ]
+
+
+def remove_subvolume_snapshot(volume: str, snapshot: str) -> None:
+    validate_snapshot_name(snapshot)
+    with locks.volume(volume), mounted(volume) as mountpoint:
+        path = os.path.join(mountpoint, SNAPSHOTS_DIR, snapshot)
+        run_cmd(['btrfs', 'subvolume', 'delete', path], retries=1)
+
+
+def create_lvm_snapshot(volume: str, snapshot: str) -> None:
+    """ Snapshots the whole logical volume.
+
+    Only thin volumes are supported. The thin snapshot takes no space
+    upfront and is created with activation skipped, so a second device
+    with the same btrfs uuid does not appear next to the mounted origin.
+    A thick snapshot is always active along with its origin.
+    """
+    validate_snapshot_name(snapshot)
+    origin = logical_volume(volume)
+    if origin is None:
+        raise LvmPyError(f'Volume {volume} does not exist')
+    if not origin.thin:
+        raise LvmPyError(
+            f'Volume {volume} is not thin, use a subvolume snapshot'
+        )
+    name = snapshot_volume_name(volume, snapshot)
+    with locks.volume(volume):
+        run_lvm([
+            'lvcreate', '-s', '-ky', '-n', name, f'{VOLUME_GROUP}/{volume}'
+        ])
+
+
+def list_lvm_snapshots(volume: str) -> List[Snapshot]:
+    stdout = run_lvm(report_cmd('lvs', LV_FIELDS, f'vg_name={VOLUME_GROUP}'))
+    prefix = f'{volume}+'
+    return [
+        Snapshot(lv.name[len(prefix):], volume, LVM)
+        for lv in parse_volumes(stdout)
+        if lv.name.startswith(prefix) and lv.name.count('+') == 1
+    ]
+
+
+def remove_lvm_snapshot(volume: str, snapshot: str) -> None:
+    validate_snapshot_name(snapshot)
+    name = snapshot_volume_name(volume, snapshot)
+    with locks.volume(volume):
+        run_lvm(['lvremove', '-f', f'{VOLUME_GROUP}/{name}'])
+
+
+def create_snapshot(
+    volume: str,
+    snapshot: str,
+    snapshot_type: str = SUBVOLUME,
+    readonly: bool = False
+) -> None:
+    logger.info(f'Creating {snapshot_type} snapshot {snapshot} of {volume}')
+    if snapshot_type == SUBVOLUME:
+        create_subvolume_snapshot(volume, snapshot, readonly=readonly)
+    elif snapshot_type == LVM:
+        create_lvm_snapshot(volume, snapshot)
+    else:
+        raise LvmPyError(f'Unknown snapshot type {snapshot_type}')
+
+
+def list_snapshots(volume: str) -> List[Snapshot]:
+    return list_lvm_snapshots(volume) + list_subvolume_snapshots(volume)
+
+
+def remove_snapshot(
+    volume: str,
+    snapshot: str,
+    snapshot_type: str = SUBVOLUME
+) -> None:
+    logger.info(f'Removing {snapshot_type} snapshot {snapshot} of {volume}')
+    if snapshot_type == SUBVOLUME:
+        remove_subvolume_snapshot(volume, snapshot)
+    elif snapshot_type == LVM:
+        remove_lvm_snapshot(volume, snapshot)
+    else:
+        raise LvmPyError(f'Unknown snapshot type {snapshot_type}')
+
+
+def create_from_snapshot(name: str, volume: str, snapshot: str) -> None:
+    """ Creates a writable volume from a thin lvm snapshot without copying.
+
+    Btrfs identifies filesystems by uuid, so the copy gets a new
+    metadata uuid to be mountable along with the origin.
+    """
+    validate_snapshot_name(snapshot)
+    source = logical_volume(snapshot_volume_name(volume, snapshot))
+    if source is None:
+        raise LvmPyError(f'Snapshot {snapshot} of {volume} does not exist')
+    if not source.thin:
+        raise LvmPyError('Volumes can be created only from thin snapshots')
+    logger.info(f'Creating volume {name} from snapshot {source.name}')
+    with locks.volume(name):
+        run_lvm([
+            'lvcreate', '-s', '-kn', '-n', name, f'{VOLUME_GROUP}/{source.name}'
+        ])
+        try:
+            run_cmd(['btrfstune', '-f', '-m', volume_device(name)], retries=1)
+        except LvmPyError:
+            run_lvm(['lvremove', '-f', volume_device(name)])
+            raise
+    volume_cache.add(name)
@@ -0,0 +1,168 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import http.client
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Optional
+
+from .config import (
+    LIVENESS_ROUTE,
+    PORT,
+    SOCKET_PATH,
+    SUPERVISOR_FAILURE_THRESHOLD,
+    SUPERVISOR_INTERVAL,
+    SUPERVISOR_PROBE_TIMEOUT,
+    TCP_ENABLED
+)
+
+logger = logging.getLogger(__name__)
+
+PROBE_HOST = '127.0.0.1'
+
+
+def sd_notify(state: str) -> bool:
+    """ Sends a state line (e.g. WATCHDOG=1) to systemd, if supervised """
+    address = os.getenv('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode())
+    except OSError as e:
+        logger.warning('Failed to notify systemd with %s: %s', state, e)
+        return False
+    return True
+
+
+def keepalive_interval(interval: float) -> float:
+    """ Caps the probe interval at half of the systemd watchdog timeout """
+    usec = os.getenv('WATCHDOG_USEC')
+    if not usec or not usec.isdigit():
+        return interval
+    return min(interval, int(usec) / 2_000_000)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def probe_connection(timeout: float) -> http.client.HTTPConnection:
+    if SOCKET_PATH is None or TCP_ENABLED:
+        return http.client.HTTPConnection(PROBE_HOST, PORT, timeout=timeout)
+    return UnixHTTPConnection(SOCKET_PATH, timeout=timeout)
+
+
+def probe(
+    route: str = LIVENESS_ROUTE,
+    timeout: float = SUPERVISOR_PROBE_TIMEOUT
+) -> bool:
+    connection = probe_connection(timeout)
+    try:
+        connection.request('GET', route)
+        return connection.getresponse().status == 200
+    except (OSError, http.client.HTTPException) as e:
+        logger.warning('Liveness probe %s failed: %s', route, e)
+        return False
+    finally:
+        connection.close()
+
+
+class HealthSupervisor(threading.Thread):
+    """ Probes the liveness route of the running server and feeds the
+    systemd watchdog.
+
+    The first successful probe reports READY=1, every healthy probe sends
+    a WATCHDOG=1 keep-alive. After `failure_threshold` consecutive failed
+    probes the keep-alives stop and WATCHDOG=trigger is sent, so systemd
+    restarts the service according to its Restart= policy. Until the
+    server answers for the first time it is probed every second.
+    """
+
+    def __init__(
+        self,
+        route: str = LIVENESS_ROUTE,
+        interval: float = SUPERVISOR_INTERVAL,
+        failure_threshold: int = SUPERVISOR_FAILURE_THRESHOLD,
+        timeout: float = SUPERVISOR_PROBE_TIMEOUT
+    ):
+        super().__init__(name='health-supervisor', daemon=True)
+        self.route = route
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.timeout = timeout
+        self.failures = 0
+        self.ready = False
+        self.last_success: Optional[float] = None
+        self._stopped = threading.Event()
+
+    def check(self) -> bool:
+        if probe(route=self.route, timeout=self.timeout):
+            self.failures = 0
+            self.last_success = time.time()
+            if not self.ready:
+                logger.info('Server is answering, notifying systemd')
+                sd_notify('READY=1')
+                self.ready = True
+            sd_notify('WATCHDOG=1')
+            return True
+        if not self.ready:
+            # start up is bounded by systemd TimeoutStartSec
+            return False
+        self.failures += 1
+        if self.failures < self.failure_threshold:
+            sd_notify('WATCHDOG=1')
+        elif self.failures == self.failure_threshold:
+            logger.error(
+                'Liveness probe failed %d times in a row, requesting restart',
+                self.failures
+            )
+            sd_notify(f'STATUS=Liveness probe failed {self.failures} times')
+            sd_notify('WATCHDOG=trigger')
+        return False
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def run(self) -> None:
+        self.interval = keepalive_interval(self.interval)
+        logger.info(
+            'Starting health supervisor, interval %.1fs, threshold %d',
+            self.interval, self.failure_threshold
+        )
+        while not self._stopped.wait(
+            timeout=self.interval if self.ready else 1
+        ):
+            self.check()
+
+
+supervisor = HealthSupervisor()
@@ -0,0 +1,140 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, NamedTuple, Optional
+
+from .config import TRACE_BUFFER_SIZE, TRACE_SLOW_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+
+class CommandTrace(NamedTuple):
+    command: str
+    name: str
+    started_at: float
+    duration: float
+    attempt: int
+    returncode: int
+    stderr_size: int
+    slow: bool
+
+    def as_dict(self) -> dict:
+        return self._asdict()
+
+
+Observer = Callable[[CommandTrace], None]
+
+LVM_COMMAND_PREFIXES = ('lv', 'vg', 'pv')
+
+
+def is_lvm_command(name: str) -> bool:
+    return name == 'lvm' or name.startswith(LVM_COMMAND_PREFIXES)
+
+
+class CommandTracer:
+    """ Records every external command into a fixed size ring buffer.
+
+    Observers (e.g. metrics) are notified about each recorded command.
+    Commands running longer than `slow_threshold` seconds are logged.
+    Completion times of the last succeeded and failed lvm commands are
+    kept for the readiness check.
+    """
+
+    def __init__(
+        self,
+        size: int = TRACE_BUFFER_SIZE,
+        slow_threshold: float = TRACE_SLOW_THRESHOLD
+    ):
+        self.slow_threshold = slow_threshold
+        self.observers: List[Observer] = []
+        self._lock = threading.Lock()
+        self._traces: Deque[CommandTrace] = deque(maxlen=size)
+        self.last_lvm_success: Optional[float] = None
+        self.last_lvm_failure: Optional[float] = None
+
+    def subscribe(self, observer: Observer) -> None:
+        self.observers.append(observer)
+
+    def record(
+        self,
+        cmd: List[str],
+        started_at: float,
+        duration: float,
+        returncode: int,
+        stderr_size: int = 0,
+        attempt: int = 0
+    ) -> CommandTrace:
+        trace = CommandTrace(
+            command=' '.join(cmd),
+            name=os.path.basename(cmd[0]) if cmd else '',
+            started_at=started_at,
+            duration=duration,
+            attempt=attempt,
+            returncode=returncode,
+            stderr_size=stderr_size,
+            slow=duration >= self.slow_threshold
+        )
+        with self._lock:
+            self._traces.append(trace)
+            if is_lvm_command(trace.name):
+                if returncode == 0:
+                    self.last_lvm_success = started_at + duration
+                else:
+                    self.last_lvm_failure = started_at + duration
+        if trace.slow:
+            logger.warning(
+                f'Slow command [{trace.command}] took {duration:.2f}s, '
+                f'attempt {attempt}, code {returncode}'
+            )
+        for observer in self.observers:
+            try:
+                observer(trace)
+            except Exception:
+                logger.exception('Command trace observer failed')
+        return trace
+
+    def run(self, cmd: List[str], attempt: int = 0) -> subprocess.CompletedProcess:
+        started_at, start = time.time(), time.monotonic()
+        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.record(
+            cmd, started_at, time.monotonic() - start, res.returncode,
+            stderr_size=len(res.stderr or b''), attempt=attempt
+        )
+        return res
+
+    def traces(
+        self,
+        slow: bool = False,
+        limit: Optional[int] = None
+    ) -> List[CommandTrace]:
+        """ Returns recorded commands, the most recent first """
+        with self._lock:
+            traces = list(reversed(self._traces))
+        if slow:
+            traces = [trace for trace in traces if trace.slow]
+        return traces[:limit] if limit is not None else traces
+
+
+tracer = CommandTracer()
@@ -0,0 +1,83 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from .config import VG_WATCHDOG_INTERVAL, VOLUME_GROUP
+from .core import ensure_thin_pool_capacity, ensure_volume_group
+
+logger = logging.getLogger(__name__)
+
+
+class VolumeGroupWatchdog(threading.Thread):
+    """ Re-checks that the volume group exists and is active.
+
+    The check runs on start, every `interval` seconds and immediately
+    after `trigger` is called (e.g. when a driver request failed).
+    `last_check` is the time of the last successful check. When thin
+    provisioning is enabled the pool is extended on the same schedule
+    once its usage crosses the autoextend threshold.
+    """
+
+    def __init__(
+        self,
+        group: str = VOLUME_GROUP,
+        interval: int = VG_WATCHDOG_INTERVAL
+    ):
+        super().__init__(name='vg-watchdog', daemon=True)
+        self.group = group
+        self.interval = interval
+        self.last_check: Optional[float] = None
+        self.last_error: Optional[Exception] = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def check(self) -> bool:
+        try:
+            ensure_volume_group(name=self.group)
+            ensure_thin_pool_capacity(group=self.group)
+        except Exception as e:
+            logger.exception('Volume group %s check failed', self.group)
+            self.last_error = e
+            return False
+        self.last_error = None
+        self.last_check = time.time()
+        return True
+
+    def trigger(self) -> None:
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run(self) -> None:
+        logger.info(
+            'Starting volume group watchdog, interval %ds', self.interval
+        )
+        while not self._stopped.is_set():
+            self.check()
+            self._wakeup.wait(timeout=self.interval)
+            self._wakeup.clear()
+
+
+watchdog = VolumeGroupWatchdog()
@@ -0,0 +1,110 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from .config import FS_QUEUE_SIZE, FS_QUEUE_TIMEOUT, FS_WORKERS
+from .metrics import WORKER_QUEUE_DEPTH, WORKER_REJECTED, WORKERS_BUSY
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class WorkerPool:
+    """ Bounded pool running filesystem work (mkfs, mount) of distinct volumes.
+
+    At most `workers` tasks run at once and `queue_size` more may wait.
+    Submitting beyond that blocks up to `timeout` seconds and then raises
+    QueueFullError. Tasks submitted from a worker run inline, so nested
+    operations (e.g. batch mount) never wait for a free worker.
+    """
+
+    def __init__(
+        self,
+        workers: int = FS_WORKERS,
+        queue_size: int = FS_QUEUE_SIZE,
+        timeout: float = FS_QUEUE_TIMEOUT,
+        name: str = 'fs'
+    ):
+        self.name = name
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=f'lvmpy-{name}'
+        )
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.queued = 0
+        self.active = 0
+
+    def _update(self, queued: int = 0, active: int = 0) -> None:
+        with self._lock:
+            self.queued += queued
+            self.active += active
+            WORKER_QUEUE_DEPTH.set(self.queued, pool=self.name)
+            WORKERS_BUSY.set(self.active, pool=self.name)
+
+    def _run(self, func: Callable, args: tuple, kwargs: dict):
+        self._update(queued=-1, active=1)
+        self._local.worker = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._local.worker = False
+            self._update(active=-1)
+            self._slots.release()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        if getattr(self._local, 'worker', False):
+            future: Future = Future()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if not self._slots.acquire(timeout=self.timeout):
+            WORKER_REJECTED.inc(pool=self.name)
+            raise QueueFullError(
+                f'{self.queued} {self.name} tasks are waiting for workers'
+            )
+        self._update(queued=1)
+        try:
+            # the task keeps the request context, e.g. its retry deadline
+            context = contextvars.copy_context()
+            return self._executor.submit(
+                context.run, self._run, func, args, kwargs
+            )
+        except Exception:
+            self._update(queued=-1)
+            self._slots.release()
+            raise
+
+    def run(self, func: Callable, *args, **kwargs):
+        return self.submit(func, *args, **kwargs).result()
+
+
+fs_workers = WorkerPool()
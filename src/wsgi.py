@@ -0,0 +1,110 @@
+#   -*- coding: utf-8 -*-
+#
+#   This file is part of docker-lvmpy
+#
+#   Copyright (C) 2019-Present SKALE Labs
+#
+#   docker-lvmpy is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   docker-lvmpy is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with docker-lvmpy.  If not, see <https://www.gnu.org/licenses/>
+
+import logging
+import os
+
+from gunicorn.app.base import BaseApplication
+
+from .app import (
+    app,
+    HOST,
+    PORT,
+    start_supervisor,
+    start_warm_pool,
+    start_watchdog,
+    verify_volume_group
+)
+from .config import (
+    SERVER_THREADS,
+    SERVER_TIMEOUT,
+    SERVER_WORKERS,
+    SOCKET_PATH,
+    TCP_ENABLED
+)
+
+logger = logging.getLogger(__name__)
+
+
+class GunicornApplication(BaseApplication):
+    def __init__(self, application, options: dict):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def post_worker_init(worker):
+    # threads do not survive fork, so every worker runs its own watchdog
+    # and warm pool filler (fills are serialized by the file lock).
+    # SIGUSR1 is left to gunicorn, workers reopen log files on it
+    start_watchdog(handle_signal=False)
+    start_warm_pool()
+
+
+def when_ready(server):
+    # a single supervisor in the master probes the workers through the
+    # listening socket and feeds the systemd watchdog
+    start_supervisor()
+
+
+def binds(socket_path=SOCKET_PATH, tcp_enabled=TCP_ENABLED) -> list:
+    if socket_path is None:
+        return [f'{HOST}:{PORT}']
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    addresses = [f'unix:{socket_path}']
+    if tcp_enabled:
+        addresses.append(f'{HOST}:{PORT}')
+    return addresses
+
+
+def gunicorn_options(
+    workers: int = SERVER_WORKERS,
+    threads: int = SERVER_THREADS
+) -> dict:
+    return {
+        'bind': binds(),
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        'timeout': SERVER_TIMEOUT,
+        'post_worker_init': post_worker_init,
+        'when_ready': when_ready
+    }
+
+
+def run():
+    verify_volume_group()
+    options = gunicorn_options()
+    logger.info(
+        'Starting %d workers with %d threads',
+        options['workers'], options['threads']
+    )
+    if options['workers'] > 1:
+        logger.warning(
+            '/metrics is not supported with multiple workers, '
+            'every worker reports its own counters'
+        )
+    GunicornApplication(app, options).run()
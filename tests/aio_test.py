@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import mock
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.aio import create_app, run_cmd_async
+from src.core import LvmPyError
+
+
+def test_run_cmd_async():
+    assert asyncio.run(run_cmd_async(['echo', 'test'])) == 'test\n'
+
+    def timeouts_mock(retries):
+        return [0 for _ in range(retries)]
+    with mock.patch('src.aio.compose_exponantional_timeouts', timeouts_mock):
+        with pytest.raises(LvmPyError):
+            asyncio.run(run_cmd_async(['false']))
+
+
+async def post(route, data=None, method='POST'):
+    async with TestClient(TestServer(create_app())) as client:
+        res = await client.request(method, route, data=json.dumps(data or {}))
+        return res.status, await res.json()
+
+
+def test_native_routes():
+    status, data = asyncio.run(post('/Plugin.Activate'))
+    assert status == 200
+    assert data == {'Implements': ['VolumeDriver'], 'Err': ''}
+
+    volumes = {'vol-a': {}, 'vol_b': {}}
+    with mock.patch('src.aio.volume_cache.cached', return_value=volumes):
+        status, data = asyncio.run(post('/VolumeDriver.List'))
+        assert data['Volumes'] == [
+            {'Name': 'vol-a', 'Status': {}},
+            {'Name': 'vol_b', 'Status': {}}
+        ]
+        status, data = asyncio.run(post('/VolumeDriver.Get', {'Name': 'vol-a'}))
+        assert data['Volume']['Name'] == 'vol-a'
+
+
+def test_forwarded_routes():
+    status, data = asyncio.run(post('/', method='GET'))
+    assert status == 200
+    assert data == {'Err': ''}
+
+
+def test_health_routes():
+    status, data = asyncio.run(post('/health/live', method='GET'))
+    assert status == 200
+    assert data == {'Err': ''}
+
+    with mock.patch('src.app.watchdog.last_error', None):
+        status, data = asyncio.run(post('/health/ready', method='GET'))
+    assert status == 200
+    assert data['Ready'] is True
+    assert data['LockedVolumes'] == 0
+
+    with mock.patch('src.app.watchdog.last_error', LvmPyError('Test error')):
+        status, data = asyncio.run(post('/health/ready', method='GET'))
+    assert status == 503
+    assert data['Err'] == 'Volume group check failed: Test error'
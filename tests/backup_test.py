@@ -0,0 +1,83 @@
+import os
+from contextlib import contextmanager
+
+import mock
+import pytest
+
+from src.backup import RECEIVED_RE, backup, parse_args, restore, run_pipeline
+from src.core import LvmPyError, create, mount, remove, unmount
+
+VOLUME = 'vol-backup'
+RESTORED_VOLUME = 'vol-restored'
+
+
+def test_run_pipeline(tmp_path):
+    output_path = tmp_path / 'output'
+    with open(output_path, 'wb') as output:
+        outputs = run_pipeline(
+            [['echo', 'test'], ['tr', 'a-z', 'A-Z'], ['sh', '-c', 'cat; echo err >&2']],
+            stdout=output
+        )
+    assert output_path.read_text() == 'TEST\n'
+    assert outputs == ['', '', 'err\n']
+    with open(os.devnull, 'wb') as output:
+        with pytest.raises(LvmPyError):
+            run_pipeline([['echo', 'test'], ['false']], stdout=output)
+
+
+def test_received_re():
+    stderr = 'At subvol backup-20240101T000000\nAt snapshot backup-20240102T000000\n'
+    assert RECEIVED_RE.findall(stderr) == [
+        'backup-20240101T000000', 'backup-20240102T000000'
+    ]
+
+
+def test_parse_args():
+    args = parse_args(['backup', VOLUME, '-', '--parent', 'first', '--prune'])
+    assert (args.command, args.volume, args.output) == ('backup', VOLUME, '-')
+    assert args.parent == 'first' and args.prune and not args.no_compress
+    args = parse_args(['restore', VOLUME, 'backup.zst', '--size', '1g'])
+    assert (args.command, args.input, args.size) == ('restore', 'backup.zst', '1g')
+
+
+def test_failed_backup(tmp_path):
+    output = tmp_path / 'failed.zst'
+
+    @contextmanager
+    def mounted(volume):
+        yield str(tmp_path)
+
+    with mock.patch('src.backup.mounted', mounted), \
+            mock.patch('src.backup.create_subvolume_snapshot'), \
+            mock.patch('src.backup.remove_subvolume_snapshot') as remove_mock, \
+            mock.patch('src.backup.run_pipeline',
+                       side_effect=LvmPyError('Test error')):
+        with pytest.raises(LvmPyError):
+            backup(VOLUME, str(output), snapshot='backup-failed')
+    remove_mock.assert_called_once_with(VOLUME, 'backup-failed')
+    assert not output.exists()
+
+
+def test_backup_restore(vg, tmp_path):
+    full, incremental = tmp_path / 'full.zst', tmp_path / 'incremental.zst'
+    try:
+        create(VOLUME, '256m')
+        mountpoint = mount(VOLUME, is_schain=False)
+        with open(os.path.join(mountpoint, 'first'), 'w') as f:
+            f.write('first')
+        first = backup(VOLUME, str(full), snapshot='backup-first')
+        with open(os.path.join(mountpoint, 'second'), 'w') as f:
+            f.write('second')
+        backup(VOLUME, str(incremental), parent=first, snapshot='backup-second')
+        unmount(VOLUME, is_schain=False)
+
+        assert restore(RESTORED_VOLUME, str(full), size='256m') == 'backup-first'
+        assert restore(RESTORED_VOLUME, str(incremental)) == 'backup-second'
+        restored = mount(RESTORED_VOLUME, is_schain=False)
+        assert sorted(
+            name for name in os.listdir(restored) if name != '.snapshots'
+        ) == ['first', 'second']
+        unmount(RESTORED_VOLUME, is_schain=False)
+    finally:
+        remove(VOLUME, is_schain=False)
+        remove(RESTORED_VOLUME, is_schain=False)
@@ -0,0 +1,90 @@
+import mock
+
+from src.core import LvmPyError, VolumeOperation, batch
+
+
+def test_batch(make_lv):
+    calls = []
+
+    def record(name):
+        def func(*args, **kwargs):
+            calls.append((name, args[0]))
+        return func
+
+    def failing_mount(name, is_schain=True):
+        if name == 'vol-d':
+            raise LvmPyError('Test error')
+        calls.append(('mount', name))
+        return f'/mnt/{name}'
+
+    operations = [
+        VolumeOperation('mount', 'vol-c'),
+        VolumeOperation('create', 'vol-c', size='256m'),
+        VolumeOperation('remove', 'vol-a'),
+        VolumeOperation('remove', 'vol-b'),
+        VolumeOperation('remove', 'vol-x'),
+        VolumeOperation('unmount', 'vol-e'),
+        VolumeOperation('mount', 'vol-d'),
+        VolumeOperation('resize', 'vol-c'),
+    ]
+    lvs = [
+        make_lv('vol-a'), make_lv('vol-b'),
+        make_lv('vol-a+nightly', 'Vwi---tz-k', active=False)
+    ]
+    with mock.patch('src.core.all_volumes', return_value=lvs), \
+            mock.patch('src.core.mount_table') as table_mock, \
+            mock.patch('src.core.run_lvm') as run_mock, \
+            mock.patch('src.core.ensure_group_active') as active_mock, \
+            mock.patch('src.core.unmount', record('unmount')), \
+            mock.patch('src.core.create_logical_volume', record('lvcreate')), \
+            mock.patch('src.core.format_volume', record('mkfs')), \
+            mock.patch('src.core.mount', failing_mount), \
+            mock.patch('src.core.volume_device', lambda name: f'/dev/{name}'):
+        table_mock.is_mounted.return_value = False
+        results = batch(operations)
+
+    active_mock.assert_called_once()
+    # lvm snapshots are removed along with the origin
+    run_mock.assert_called_once_with([
+        'lvremove', '-f', '/dev/vol-a', '/dev/vol-b', '/dev/vol-a+nightly'
+    ])
+    assert calls == [
+        ('unmount', 'vol-e'),
+        ('lvcreate', 'vol-c'),
+        ('mkfs', 'vol-c'),
+        ('mount', 'vol-c')
+    ]
+    assert [(r.op, r.name) for r in results] == [
+        (o.op, o.name) for o in operations
+    ]
+    assert results[0].mountpoint == '/mnt/vol-c'
+    assert [r.error for r in results[:4]] == [None] * 4
+    assert results[4].error == 'Volume vol-x does not exist'
+    assert results[6].error == 'Test error'
+    assert results[7].error == 'Unknown operation resize'
+
+
+def test_batch_take_after_remove():
+    taken = []
+
+    def take(name, size):
+        taken.append(name)
+        return True
+
+    operations = [
+        VolumeOperation('create', 'vol-x', size='256m'),
+        VolumeOperation('remove', 'vol-x'),
+        VolumeOperation('create', 'vol-y'),
+        VolumeOperation('create', 'vol-z', size='256m', thin=True)
+    ]
+    with mock.patch('src.core.all_volumes', return_value=[]), \
+            mock.patch('src.core.ensure_group_active'), \
+            mock.patch('src.core.create_logical_volume') as create_mock, \
+            mock.patch('src.core.format_volume'):
+        results = batch(operations, take=take)
+    # the remove phase runs first, the volume is taken afterwards
+    assert results[1].error == 'Volume vol-x does not exist'
+    assert results[0].error is None
+    assert results[2].error == 'Size is required to create vol-y'
+    assert taken == ['vol-x']
+    create_mock.assert_called_once_with('vol-z', '256m', thin=True)
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from src.config import PHYSICAL_VOLUME, VOLUME_GROUP
 from src.core import (
@@ -5,6 +7,9 @@ from src.core import (
     remove, remove_physical_volume, remove_volume_group,
     volumes
 )
+from src.report import LogicalVolume
+
+MB = 2 ** 20
 
 
 @pytest.fixture(scope='module')
@@ -26,3 +31,24 @@ def vg(pv):
         for v in vols:
             remove(v)
         remove_volume_group(VOLUME_GROUP)
+
+
+@pytest.fixture
+def make_lv():
+    """ Builds logical volumes as returned by lvs queries """
+    def factory(name, attr='-wi-a-----', size=256 * MB, active=True):
+        return LogicalVolume(name, 'test-vg', size, attr, active, ())
+    return factory
+
+
+@pytest.fixture
+def lvs_report():
+    """ Builds json output of lvs for (name, attr) pairs """
+    def factory(*volumes):
+        return json.dumps({'report': [{'lv': [
+            {'lv_name': name, 'vg_name': 'test-vg', 'lv_size': str(256 * MB),
+             'lv_attr': attr, 'devices': '',
+             'lv_active': 'active' if attr[4:5] == 'a' else ''}
+            for name, attr in volumes
+        ]}]})
+    return factory
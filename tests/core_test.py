@@ -6,8 +6,10 @@ import mock
 import pytest
 
 from src.config import FILESTORAGE_MAPPING
+from src.mkfs import FormatOptions
 from src.core import (
-    create, remove, volumes, LvmPyError,
+    create, remove, volumes, LvmPyError, VolumeOperation,
+    batch,
     mount, path, unmount,
     get as get_volume,
     device_users,
@@ -16,7 +18,12 @@ from src.core import (
     get_inactive_volumes,
     mountpoint_users,
     physical_volume_from_group,
+    resize,
+    resize_many,
     run_cmd,
+    thin_pool,
+    thin_pool_enabled,
+    volume_cache,
     volume_device,
     volume_mountpoint
 )
@@ -187,3 +194,123 @@ def test_volume_group_activation(pv, vg):
     assert get_inactive_volumes(group=vg) == [FIRST_VOLUME_NAME]
     ensure_volume_group(name=vg)
     assert get_inactive_volumes(group=vg) == []
+
+
+def test_inactive_thin_volumes(make_lv):
+    lvs = [
+        make_lv('vol-a', 'Vwi---tz--', active=False),
+        make_lv('vol-b', 'Vwi-a-tz--'),
+        make_lv('vol-a+snap', 'Vwi---tz-k', active=False)
+    ]
+    with mock.patch('src.core.query_volumes', return_value=lvs):
+        assert get_inactive_volumes(group='test-vg') == ['vol-a']
+
+
+def test_resize_cached_size(make_lv):
+    before = [make_lv('vol-a', size=256 * 2 ** 20)]
+    # extents of 4m, lvm rounds 258m up
+    after = [make_lv('vol-a', size=260 * 2 ** 20)]
+    with mock.patch('src.core.query_volumes', side_effect=[before, after]), \
+            mock.patch('src.core.run_lvm'), \
+            mock.patch('src.core.grow_filesystem'), \
+            mock.patch('src.core.thin_pool_enabled', return_value=False), \
+            mock.patch('src.core.volume_cache') as cache_mock:
+        resize_many({'vol-a': '258m'})
+    cache_mock.update.assert_called_once_with('vol-a', size=260 * 2 ** 20)
+
+
+def test_volume_cache(vg):
+    volume_cache.refresh()
+    create(FIRST_VOLUME_NAME, '250m')
+    assert FIRST_VOLUME_NAME in volumes(cached=True)
+    assert get_volume(FIRST_VOLUME_NAME, cached=True) == FIRST_VOLUME_NAME
+
+    mount(FIRST_VOLUME_NAME, is_schain=False)
+    mountpoint = volume_mountpoint(FIRST_VOLUME_NAME)
+    assert volume_cache.get(FIRST_VOLUME_NAME)['mountpoint'] == mountpoint
+    unmount(FIRST_VOLUME_NAME, is_schain=False)
+    assert volume_cache.get(FIRST_VOLUME_NAME)['mountpoint'] is None
+
+    remove(FIRST_VOLUME_NAME)
+    assert FIRST_VOLUME_NAME not in volumes(cached=True)
+
+    # volume created bypassing the driver is found by forced refresh
+    run_cmd(['lvcreate', '-L', '250mb', '-n', SECOND_VOLUME_NAME, vg])
+    assert SECOND_VOLUME_NAME not in volumes(cached=True)
+    assert SECOND_VOLUME_NAME in volume_cache.volumes(force=True)
+    remove(SECOND_VOLUME_NAME)
+
+
+@pytest.mark.skipif(not thin_pool_enabled(), reason='Thin pool is not configured')
+def test_create_remove_thin(vg):
+    create(FIRST_VOLUME_NAME, '250m', thin=True)
+    assert FIRST_VOLUME_NAME in volumes()
+    assert thin_pool(vg) is not None
+    mount(FIRST_VOLUME_NAME, is_schain=False)
+    unmount(FIRST_VOLUME_NAME, is_schain=False)
+    remove(FIRST_VOLUME_NAME)
+    assert FIRST_VOLUME_NAME not in volumes()
+
+
+def test_create_thin_without_pool(vg):
+    with mock.patch('src.core.THIN_POOL_SIZE', None):
+        with pytest.raises(LvmPyError):
+            create(FIRST_VOLUME_NAME, '250m', thin=True)
+
+
+def test_resize(vg):
+    create(FIRST_VOLUME_NAME, '256m')
+    create(SECOND_VOLUME_NAME, '256m')
+    try:
+        mountpoint = mount(FIRST_VOLUME_NAME, is_schain=False)
+        resize(FIRST_VOLUME_NAME, '512m')
+        stat = os.statvfs(mountpoint)
+        assert stat.f_blocks * stat.f_frsize > 256 * 2 ** 20
+        unmount(FIRST_VOLUME_NAME, is_schain=False)
+
+        resize_many({FIRST_VOLUME_NAME: '768m', SECOND_VOLUME_NAME: '512m'})
+        info = volume_cache.volumes(force=True)
+        assert info[FIRST_VOLUME_NAME]['size'] == 768 * 2 ** 20
+        assert info[SECOND_VOLUME_NAME]['size'] == 512 * 2 ** 20
+
+        with pytest.raises(LvmPyError):
+            resize(FIRST_VOLUME_NAME, '256m')
+        with pytest.raises(LvmPyError):
+            resize('Not-existing-volume', '1g')
+    finally:
+        remove(FIRST_VOLUME_NAME, is_schain=False)
+        remove(SECOND_VOLUME_NAME, is_schain=False)
+
+
+def test_batch(vg):
+    results = batch([
+        VolumeOperation('create', FIRST_VOLUME_NAME, size='256m'),
+        VolumeOperation('create', SECOND_VOLUME_NAME, size='256m'),
+        VolumeOperation('mount', FIRST_VOLUME_NAME, is_schain=False),
+        VolumeOperation('mount', SECOND_VOLUME_NAME, is_schain=False)
+    ])
+    assert [r.error for r in results] == [None] * 4
+    assert results[2].mountpoint == volume_mountpoint(FIRST_VOLUME_NAME)
+    assert os.path.ismount(volume_mountpoint(SECOND_VOLUME_NAME))
+
+    results = batch([
+        VolumeOperation('remove', FIRST_VOLUME_NAME, is_schain=False),
+        VolumeOperation('remove', SECOND_VOLUME_NAME, is_schain=False)
+    ])
+    assert [r.error for r in results] == [None] * 2
+    lvs = volumes()
+    assert FIRST_VOLUME_NAME not in lvs
+    assert SECOND_VOLUME_NAME not in lvs
+
+
+def test_create_format_options(vg):
+    options = FormatOptions(
+        metadata='single', nodesize=32768, features=('no-holes',)
+    )
+    create(FIRST_VOLUME_NAME, '256m', format_options=options)
+    try:
+        out = run_cmd(['btrfs', 'inspect-internal', 'dump-super',
+                       volume_device(FIRST_VOLUME_NAME)])
+        assert 'nodesize\t\t\t32768' in out
+    finally:
+        remove(FIRST_VOLUME_NAME)
@@ -4,10 +4,11 @@ import pytest
 
 from src.health import (
     EndpointCheck,
+    FastCheck,
     PreinstallCheck,
     heal_service
 )
-from src.core import run_cmd
+from src.core import LvmPyError, run_cmd
 
 
 @pytest.fixture
@@ -100,3 +101,46 @@ def test_heal_service():
     broken_ec = EndpointCheck(url='http://127.0.0.1:3333')
     r = heal_service(broken_ec)
     assert r is True
+
+
+def test_fast_healthcheck(vg):
+    steps = FastCheck(group=vg).run()
+    assert [step.name for step in steps] == [
+        'volume-group', 'create', 'mkfs', 'mount', 'snapshot', 'unmount',
+        'remove'
+    ]
+    assert all(step.error is None for step in steps)
+
+
+def test_fast_healthcheck_failed():
+    check = FastCheck(group='test-vg')
+    with mock.patch.object(check, 'check_volume_group'), \
+            mock.patch.object(check, 'create_volume'), \
+            mock.patch.object(check, 'format_volume',
+                              side_effect=LvmPyError('Test error')), \
+            mock.patch.object(check, 'cleanup') as cleanup_mock:
+        with pytest.raises(LvmPyError):
+            check.run()
+    assert [(step.name, step.error) for step in check.steps] == [
+        ('volume-group', None), ('create', None), ('mkfs', 'Test error')
+    ]
+    assert cleanup_mock.call_count == 2
+
+
+def test_fast_healthcheck_thin_pool(lvs_report):
+    check = FastCheck(group='test-vg')
+    state = mock.Mock(**{'volume_groups.return_value': ['test-vg']})
+    output = lvs_report(
+        ('[lvol0_pmspare]', 'ewi-------'),
+        ('pool', 'twi-aotz--'),
+        ('vol-a', 'Vwi-a-tz--'),
+        ('vol-a+nightly', 'Vwi---tz-k')
+    )
+    with mock.patch('src.health.lvm_state', return_value=state), \
+            mock.patch('src.core.run_lvm', return_value=output):
+        check.check_volume_group()
+    output = lvs_report(('pool', 'twi-aotz--'), ('vol-b', 'Vwi---tz--'))
+    with mock.patch('src.health.lvm_state', return_value=state), \
+            mock.patch('src.core.run_lvm', return_value=output):
+        with pytest.raises(LvmPyError):
+            check.check_volume_group()
@@ -1,7 +1,9 @@
 import os
 from src.install import (
     create_folders,
-    generate_config_files
+    generate_config_files,
+    generate_etc_config,
+    generate_plugin_spec
 )
 
 
@@ -20,9 +22,22 @@ def test_ensure_config_files():
     assert os.path.isfile('/etc/systemd/system/docker-lvmpy.service')
     with open('/etc/systemd/system/docker-lvmpy.service') as service_file:
         service_content = service_file.read()
-        assert service_content == '\n[Unit]\nDescription=python lvm docker plugin\nConflicts=getty@tty1.service\nAfter=network.target\n\n[Service]\nType=simple\nWorkingDirectory=/opt/docker-lvmpy/\nExecStart=/usr/local/bin/lvmpy\nEnvironmentFile=/etc/docker-lvmpy/lvm-environment\nRestart=on-failure\nKillSignal=SIGINT\nStandardError=syslog\nNotifyAccess=all\n\n[Install]\nWantedBy=multi-user.target\n'  # noqa
+        assert service_content == '\n[Unit]\nDescription=python lvm docker plugin\nConflicts=getty@tty1.service\nAfter=network.target\n\n[Service]\nType=notify\nWorkingDirectory=/opt/docker-lvmpy/\nExecStart=/usr/local/bin/lvmpy\nEnvironmentFile=/etc/docker-lvmpy/lvm-environment\nRestart=on-failure\nWatchdogSec=60\nKillSignal=SIGINT\nStandardError=syslog\nNotifyAccess=all\n\n[Install]\nWantedBy=multi-user.target\n'  # noqa
 
     assert os.path.isfile('/etc/docker/plugins/lvmpy.json')
     with open('/etc/docker/plugins/lvmpy.json') as plugin_file:
         plugin_content = plugin_file.read()
         assert plugin_content == '{"Name": "lvmpy", "Description": "A simple volume driver for lvm volumes written in python", "Addr": "http://127.0.0.1:7373"}'  # noqa
+
+
+def test_unix_socket_config():
+    socket_path = '/run/docker/plugins/lvmpy.sock'
+    assert generate_plugin_spec(socket_path) == f'unix://{socket_path}'
+    etc_config = generate_etc_config(
+        block_device='/dev/sdt',
+        volume_group='schains',
+        filestorage_mapping='/mnt/filestorage',
+        server_mode='flask',
+        socket_path=socket_path
+    )
+    assert etc_config.split('\n')[-1] == f'LVMPY_SOCKET={socket_path}'
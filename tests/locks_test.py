@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from multiprocessing import Process
+
+from src.locks import FileLockManager, Generation, LockManager
+
+
+def test_volume_locks_are_independent():
+    manager = LockManager()
+    entered = threading.Event()
+
+    def hold_other_volume():
+        with manager.volume('vol_b'):
+            entered.set()
+
+    with manager.volume('vol-a'):
+        t = threading.Thread(target=hold_other_volume)
+        t.start()
+        assert entered.wait(timeout=1)
+        t.join()
+    assert manager.active() == []
+
+
+def test_volume_lock_serializes_same_volume():
+    manager = LockManager()
+    events = []
+
+    def hold(tag):
+        with manager.volume('vol-a'):
+            events.append(f'{tag}-in')
+            time.sleep(0.1)
+            events.append(f'{tag}-out')
+
+    threads = [threading.Thread(target=hold, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert events[0][0] == events[1][0]
+    assert events[2][0] == events[3][0]
+
+
+def test_volume_lock_reentrant():
+    manager = LockManager()
+    with manager.volume('vol-a'):
+        with manager.volume('vol-a'):
+            assert manager.active() == ['vol-a']
+    assert manager.active() == []
+
+
+def hold_in_process(lock_dir, path):
+    manager = FileLockManager(lock_dir=lock_dir)
+    with manager.volume('vol-a'):
+        with open(path, 'a') as f:
+            f.write('in\n')
+        time.sleep(0.2)
+        with open(path, 'a') as f:
+            f.write('out\n')
+
+
+def test_file_locks_serialize_processes(tmp_path):
+    lock_dir, path = str(tmp_path / 'locks'), str(tmp_path / 'events')
+    processes = [
+        Process(target=hold_in_process, args=(lock_dir, path))
+        for _ in range(2)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    with open(path) as f:
+        assert f.read() == 'in\nout\nin\nout\n'
+
+
+def test_file_lock_reentrant(tmp_path):
+    manager = FileLockManager(lock_dir=str(tmp_path))
+    with manager.group():
+        with manager.group():
+            pass
+        with manager.volume('vol-a'):
+            with manager.volume('vol-a'):
+                pass
+
+
+def test_generation(tmp_path):
+    g = Generation(path=str(tmp_path / 'run' / 'generation'))
+    assert g.current() == 0
+    first = g.bump()
+    assert first == g.current() != 0
+    assert g.bump() > first
+
+
+def test_group_lock_file(tmp_path):
+    manager = FileLockManager(lock_dir=str(tmp_path))
+    with manager.group(), manager.volume('.group'), manager.volume('group'):
+        pass
+    assert len(os.listdir(tmp_path)) == 3
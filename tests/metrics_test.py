@@ -0,0 +1,95 @@
+import mock
+
+from src.core import known_volumes, volume_device, volume_mountpoint
+from src.locks import LockManager
+from src.metrics import (
+    LOCK_WAIT,
+    Counter,
+    Histogram,
+    VolumeCollector,
+    render
+)
+from src.mounts import Mount
+from src.trace import tracer
+
+
+def test_counter_render():
+    counter = Counter('test_total', 'Test counter')
+    counter.inc(command='lvs', status='success')
+    counter.inc(2, command='lvs', status='success')
+    assert counter.value(status='success', command='lvs') == 3
+    assert counter.render() == [
+        '# HELP test_total Test counter',
+        '# TYPE test_total counter',
+        'test_total{command="lvs",status="success"} 3'
+    ]
+
+
+def test_histogram_render():
+    histogram = Histogram('test_seconds', 'Test histogram', buckets=(0.1, 1))
+    histogram.observe(0.05, route='/')
+    histogram.observe(0.5, route='/')
+    assert histogram.count(route='/') == 2
+    assert histogram.samples() == [
+        'test_seconds_bucket{route="/",le="0.1"} 1',
+        'test_seconds_bucket{route="/",le="1"} 2',
+        'test_seconds_bucket{route="/",le="+Inf"} 2',
+        'test_seconds_sum{route="/"} 0.55',
+        'test_seconds_count{route="/"} 2'
+    ]
+
+
+def test_command_metrics():
+    tracer.record(['/sbin/lvcreate', '-n', 'test'], 0, 0.2, 0)
+    tracer.record(['/sbin/lvcreate', '-n', 'test'], 0, 0.2, 5, attempt=1)
+    text = render()
+    assert 'lvmpy_commands_total{command="lvcreate",status="success"}' in text
+    assert 'lvmpy_commands_total{command="lvcreate",status="failure"}' in text
+    assert 'lvmpy_command_retries_total{command="lvcreate"} 1' in text
+    assert 'lvmpy_command_duration_seconds_count{command="lvcreate"}' in text
+
+
+def test_lock_wait():
+    count = LOCK_WAIT.count(lock='volume')
+    with LockManager().volume('test-volume'):
+        pass
+    assert LOCK_WAIT.count(lock='volume') == count + 1
+
+
+def test_volume_collector(tmp_path):
+    volumes = mock.Mock(return_value={
+        'vol-a': {
+            'size': 1024, 'data_percent': 4.0, 'metadata_percent': None,
+            'mountpoint': str(tmp_path)
+        }
+    })
+    stat = '1 0 8 0 2 0 16 0 0 250 0'
+    collector = VolumeCollector(volumes, lambda name: f'/dev/{name}', ttl=60)
+    with mock.patch('src.metrics.open', mock.mock_open(read_data=stat),
+                    create=True):
+        lines = collector.lines()
+    assert 'lvmpy_volume_size_bytes{volume="vol-a"} 1024' in lines
+    assert 'lvmpy_volume_data_percent{volume="vol-a"} 4.0' in lines
+    assert not any('metadata_percent{' in line for line in lines)
+    assert any(line.startswith('lvmpy_volume_used_bytes') for line in lines)
+    assert 'lvmpy_volume_read_bytes_total{volume="vol-a"} 4096' in lines
+    assert 'lvmpy_volume_io_seconds_total{volume="vol-a"} 0.25' in lines
+    # cached until ttl expires
+    collector.lines()
+    assert volumes.call_count == 1
+
+
+def test_known_volumes():
+    mount = Mount('0:45', '/', volume_mountpoint('vol-a'), 'btrfs',
+                  volume_device('vol-a'))
+    with mock.patch('src.core.volume_cache.last', return_value=None), \
+            mock.patch('src.core.mount_table') as table_mock, \
+            mock.patch('src.core.run_lvm') as run_mock:
+        table_mock.under.return_value = [mount]
+        assert known_volumes() == {
+            'vol-a': {'mountpoint': volume_mountpoint('vol-a')}
+        }
+    run_mock.assert_not_called()
+    with mock.patch('src.core.volume_cache.last',
+                    return_value={'vol-b': {'size': 1024}}):
+        assert known_volumes() == {'vol-b': {'size': 1024}}
@@ -0,0 +1,57 @@
+import pytest
+
+from src.mkfs import (
+    DEFAULT_FORMAT_OPTIONS,
+    FormatOptions,
+    mkfs_cmd,
+    parse_format_options
+)
+
+
+def test_parse_format_options():
+    assert parse_format_options({}) == DEFAULT_FORMAT_OPTIONS
+    assert parse_format_options({'size': '1g', 'thin': 'true'}) == \
+        DEFAULT_FORMAT_OPTIONS
+    assert parse_format_options({
+        'nodiscard': 'false',
+        'metadata': 'single',
+        'nodesize': '32k',
+        'features': 'no-holes, ^free-space-tree'
+    }) == FormatOptions(
+        nodiscard=False,
+        metadata='single',
+        nodesize=32768,
+        features=('no-holes', '^free-space-tree')
+    )
+
+
+@pytest.mark.parametrize('options', [
+    {'nodiscard': 'yes'},
+    {'metadata': 'raid1'},
+    {'nodesize': '12k'},
+    {'nodesize': '128k'},
+    {'nodesize': 'big'},
+    {'features': 'no-holes,mixed-bg'}
+])
+def test_invalid_format_options(options):
+    with pytest.raises(ValueError):
+        parse_format_options(options)
+
+
+def test_mkfs_cmd():
+    # only thin volumes are known to hold no data
+    assert mkfs_cmd('/dev/test') == ['mkfs.btrfs', '-f', '/dev/test']
+    assert mkfs_cmd('/dev/test', thin=True) == [
+        'mkfs.btrfs', '-f', '-K', '/dev/test'
+    ]
+    assert mkfs_cmd('/dev/test', FormatOptions(nodiscard=True)) == [
+        'mkfs.btrfs', '-f', '-K', '/dev/test'
+    ]
+    options = FormatOptions(
+        nodiscard=False, metadata='dup', nodesize=16384,
+        features=('no-holes', 'free-space-tree')
+    )
+    assert mkfs_cmd('/dev/test', options) == [
+        'mkfs.btrfs', '-f', '-m', 'dup', '-n', '16384',
+        '-O', 'no-holes,free-space-tree', '/dev/test'
+    ]
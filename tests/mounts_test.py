@@ -0,0 +1,70 @@
+import os
+
+import mock
+
+from src.mounts import MountTable, parse_mountinfo
+
+MOUNTINFO = (
+    '22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/sda1 rw\n'
+    '97 22 0:45 / /mnt/schains-vol--a rw,relatime shared:50 - btrfs '
+    '/dev/mapper/schains-vol--a rw,space_cache\n'
+    '98 22 0:46 / /mnt/with\\040space rw - tmpfs tmpfs rw\n'
+)
+
+
+def test_parse_mountinfo():
+    root, volume, spaced = parse_mountinfo(MOUNTINFO)
+    assert root.mountpoint == '/'
+    assert root.source == '/dev/sda1'
+    assert volume.device == '0:45'
+    assert volume.fstype == 'btrfs'
+    assert volume.source == '/dev/mapper/schains-vol--a'
+    assert spaced.mountpoint == '/mnt/with space'
+
+
+def test_mount_table(tmp_path):
+    mountinfo = tmp_path / 'mountinfo'
+    mountinfo.write_text(MOUNTINFO)
+    table = MountTable(path=str(mountinfo))
+    assert table.is_mounted('/mnt/schains-vol--a/')
+    assert not table.is_mounted('/mnt/schains-vol_b')
+    assert [m.mountpoint for m in table.mounts('/dev/mapper/schains-vol--a')] == [
+        '/mnt/schains-vol--a'
+    ]
+    assert table.mounts('/dev/mapper/schains-vol_b') == []
+
+
+def test_system_mount_table():
+    table = MountTable()
+    assert table.is_mounted('/proc')
+    assert table.mount('/').mountpoint == '/'
+
+
+def test_mount_table_device_symlink(tmp_path):
+    mountinfo = tmp_path / 'mountinfo'
+    mountinfo.write_text(
+        '97 22 0:45 / /mnt/schains-vol--a rw - btrfs /dev/dm-3 rw\n'
+    )
+    table = MountTable(path=str(mountinfo))
+    links = {'/dev/mapper/schains-vol--a': '/dev/dm-3'}
+    with mock.patch('src.mounts.os.path.realpath',
+                    side_effect=lambda path: links.get(path, path)):
+        assert [m.source for m in table.mounts('/dev/mapper/schains-vol--a')] == [
+            '/dev/dm-3'
+        ]
+
+
+def test_mount_table_after_fork(tmp_path):
+    mountinfo = tmp_path / 'mountinfo'
+    mountinfo.write_text(MOUNTINFO)
+    table = MountTable(path=str(mountinfo))
+    assert not table.is_mounted('/mnt/forked')
+    mountinfo.write_text(
+        MOUNTINFO + '99 22 0:47 / /mnt/forked rw - tmpfs tmpfs rw\n'
+    )
+    pid = os.fork()
+    if pid == 0:
+        # the child must not depend on poll events of the parent's file
+        os._exit(0 if table.is_mounted('/mnt/forked') else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
@@ -0,0 +1,76 @@
+import mock
+import pytest
+
+from src.core import LvmPyError
+from src.pool import WarmPool, parse_pool_sizes, parse_size
+
+MB = 2 ** 20
+
+
+def test_parse_size():
+    assert parse_size('256m') == 256 * MB
+    assert parse_size('1G') == 2 ** 30
+    assert parse_size('1024b') == 1024
+    assert parse_size('256mb') == 256 * MB
+    assert parse_size('1.5g') is None
+
+
+def test_parse_pool_sizes():
+    assert parse_pool_sizes('') == {}
+    assert parse_pool_sizes('256m:2,1g') == {256 * MB: 2, 2 ** 30: 1}
+    with pytest.raises(ValueError):
+        parse_pool_sizes('big:2')
+
+
+def test_take(make_lv):
+    pool = WarmPool(sizes={256 * MB: 1}, group='test-vg')
+    pooled = [
+        make_lv(f'warm+{256 * MB}+abcd0123'),
+        make_lv(f'prep+{256 * MB}+ef012345')
+    ]
+    with mock.patch.object(pool, 'pooled', return_value=pooled), \
+            mock.patch('src.pool.run_lvm') as run_mock, \
+            mock.patch('src.pool.volume_cache') as cache_mock:
+        assert pool.take('vol-a', '256m') is True
+        run_mock.assert_called_once_with(
+            ['lvrename', 'test-vg', f'warm+{256 * MB}+abcd0123', 'vol-a'],
+            retries=1
+        )
+        cache_mock.add.assert_called_once_with('vol-a', size=256 * MB)
+        run_mock.reset_mock()
+        # size is not pooled
+        assert pool.take('vol-b', '1g') is False
+        run_mock.side_effect = LvmPyError('Test error')
+        assert pool.take('vol-c', '256m') is False
+    with mock.patch.object(pool, 'pooled', return_value=[]):
+        assert pool.take('vol-d', '256m') is False
+
+
+def test_fill(make_lv):
+    pool = WarmPool(sizes={256 * MB: 2, 2 ** 30: 1}, group='test-vg')
+    pooled = [
+        make_lv(f'warm+{256 * MB}+abcd0123'),
+        make_lv(f'prep+{256 * MB}+ef012345')
+    ]
+    with mock.patch.object(pool, 'pooled', return_value=pooled), \
+            mock.patch.object(pool, 'prepare') as prepare_mock, \
+            mock.patch.object(pool, 'remove_volume') as remove_mock:
+        assert pool.check() is True
+        remove_mock.assert_called_once_with(f'prep+{256 * MB}+ef012345')
+        assert prepare_mock.call_args_list == [
+            mock.call(256 * MB), mock.call(2 ** 30)
+        ]
+
+
+def test_pooled(lvs_report):
+    pool = WarmPool(sizes={256 * MB: 1}, group='test-vg')
+    output = lvs_report(*(
+        (name, '-wi-a-----') for name in (
+            f'warm+{256 * MB}+abcd0123', f'prep+{256 * MB}+ef012345',
+            'warm', 'warm+nightly', 'vol-a'
+        )
+    ))
+    with mock.patch('src.pool.run_lvm', return_value=output):
+        assert [lv.name for lv in pool.pooled()] == [
+            f'warm+{256 * MB}+abcd0123', f'prep+{256 * MB}+ef012345'
+        ]
@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+from src.procscan import (
+    ConsumerIndex,
+    dev_id,
+    find_consumers,
+    maps_dev_id,
+    process_info
+)
+
+TMPFS_MOUNTPOINT = '/dev/shm'
+
+
+def test_find_consumers_fd():
+    with tempfile.NamedTemporaryFile(dir=TMPFS_MOUNTPOINT):
+        consumers = find_consumers('/dev/not-existing', TMPFS_MOUNTPOINT)
+        assert 'fd' in consumers[os.getpid()]
+
+
+def test_path_users():
+    with tempfile.TemporaryDirectory(dir=TMPFS_MOUNTPOINT) as directory:
+        path = os.path.join(directory, 'test')
+        with open(path, 'w'):
+            index = ConsumerIndex().scan()
+            assert os.getpid() in index.path_users(path)
+            assert os.getpid() not in index.path_users(directory)
+        assert ConsumerIndex().scan().path_users(path) == []
+
+
+def test_process_info():
+    info = process_info(os.getpid())
+    assert info.pid == os.getpid()
+    assert 'python' in info.cmdline
+    assert info.name
+    assert dev_id(os.makedev(253, 4)) == '253:4'
+    assert maps_dev_id('fd:0a') == '253:10'
@@ -0,0 +1,100 @@
+import json
+
+from src.report import (
+    STATE_FIELDS,
+    parse_state,
+    parse_volumes,
+    report_cmd
+)
+
+
+STATE_REPORT = json.dumps({
+    'report': [{
+        'pvseg': [
+            {'pv_name': '/dev/sdb', 'vg_name': 'schains', 'lv_name': 'vol-a',
+             'lv_size': '262144000', 'lv_attr': '-wi-ao----',
+             'lv_active': 'active', 'devices': '/dev/sdb(0)'},
+            {'pv_name': '/dev/sdb', 'vg_name': 'schains', 'lv_name': 'vol_b',
+             'lv_size': '314572800', 'lv_attr': '-wi-------',
+             'lv_active': '', 'devices': '/dev/sdb(63)'},
+            {'pv_name': '/dev/sdc', 'vg_name': 'schains', 'lv_name': 'vol_b',
+             'lv_size': '314572800', 'lv_attr': '-wi-------',
+             'lv_active': '', 'devices': '/dev/sdc(0)'},
+            {'pv_name': '/dev/sdc', 'vg_name': 'schains', 'lv_name': '',
+             'lv_size': '', 'lv_attr': '', 'lv_active': '', 'devices': ''},
+            {'pv_name': '/dev/sdd', 'vg_name': '', 'lv_name': '',
+             'lv_size': '', 'lv_attr': '', 'lv_active': '', 'devices': ''}
+        ]
+    }]
+})
+
+
+def test_report_cmd():
+    assert report_cmd('lvs', ('lv_name', 'vg_name'), 'vg_name=schains') == [
+        'lvs', '--reportformat', 'json', '--units', 'b', '--nosuffix',
+        '-o', 'lv_name,vg_name', '-S', 'vg_name=schains'
+    ]
+    assert '-S' not in report_cmd('pvs', STATE_FIELDS)
+
+
+def test_parse_state():
+    state = parse_state(STATE_REPORT)
+    assert [pv.name for pv in state.physical_volumes] == [
+        '/dev/sdb', '/dev/sdc', '/dev/sdd'
+    ]
+    assert state.volume_groups() == ['schains']
+    assert state.group_physical_volumes('schains') == ['/dev/sdb', '/dev/sdc']
+    assert state.group_physical_volumes('not-existing') == []
+
+    lvs = state.group_volumes('schains')
+    assert [lv.name for lv in lvs] == ['vol-a', 'vol_b']
+    assert lvs[0].size == 262144000
+    assert lvs[0].active
+    assert not lvs[1].active
+    assert lvs[1].devices == ('/dev/sdb(63)', '/dev/sdc(0)')
+
+
+def test_parse_volumes():
+    output = json.dumps({
+        'report': [{
+            'lv': [
+                {'lv_name': 'vol-a', 'vg_name': 'schains',
+                 'lv_size': '262144000', 'lv_attr': '-wi-ao----',
+                 'lv_active': 'active', 'devices': '/dev/sdb(0)'},
+                {'lv_name': '[lvol0_pmspare]', 'vg_name': 'schains',
+                 'lv_size': '4194304', 'lv_attr': 'ewi-------',
+                 'lv_active': '', 'devices': '/dev/sdb(70)'}
+            ]
+        }]
+    })
+    lvs = parse_volumes(output)
+    assert [lv.name for lv in lvs] == ['vol-a', '[lvol0_pmspare]']
+    assert not lvs[0].hidden
+    assert lvs[1].hidden
+    assert parse_volumes('') == []
+
+
+def test_parse_thin_volumes():
+    output = json.dumps({
+        'report': [{
+            'lv': [
+                {'lv_name': 'lvmpy-thinpool', 'vg_name': 'schains',
+                 'lv_size': '1073741824', 'lv_attr': 'twi-aotz--',
+                 'lv_active': 'active', 'devices': 'lvmpy-thinpool_tdata(0)',
+                 'pool_lv': '', 'data_percent': '81.50',
+                 'metadata_percent': '10.02', 'lv_metadata_size': '4194304'},
+                {'lv_name': 'vol-a', 'vg_name': 'schains',
+                 'lv_size': '262144000', 'lv_attr': 'Vwi-a-tz--',
+                 'lv_active': 'active', 'devices': '',
+                 'pool_lv': 'lvmpy-thinpool', 'data_percent': '4.00',
+                 'metadata_percent': '', 'lv_metadata_size': ''}
+            ]
+        }]
+    })
+    pool, volume = parse_volumes(output)
+    assert pool.thin_pool
+    assert pool.data_percent == 81.5
+    assert pool.metadata_size == 4194304
+    assert volume.thin
+    assert volume.pool == 'lvmpy-thinpool'
+    assert volume.metadata_percent is None
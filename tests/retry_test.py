@@ -0,0 +1,85 @@
+import time
+
+import mock
+import pytest
+
+from src.core import CommandError, run_cmd
+from src.retry import (
+    BUSY,
+    EXISTS,
+    LOCKED,
+    NOT_FOUND,
+    UNKNOWN,
+    backoff,
+    classify,
+    deadline,
+    next_delay,
+    remaining
+)
+
+
+def test_classify():
+    assert classify('  Logical Volume "vol-a" already exists in volume group') == EXISTS
+    assert classify('  Volume group "schains" not found') == NOT_FOUND
+    assert classify('  Failed to find logical volume "schains/vol-a"') == NOT_FOUND
+    assert classify('umount: /mnt/schains-vol-a: not mounted.') == NOT_FOUND
+    assert classify('umount: /mnt/schains-vol-a: target is busy.') == BUSY
+    assert classify('  Logical volume schains/vol-a in use.') == BUSY
+    assert classify("  Can't get lock for schains") == LOCKED
+    assert classify('Segmentation fault') == UNKNOWN
+
+
+def test_classify_device_errors():
+    # the device node may appear later, after udev handles lvcreate
+    err = 'mount: /mnt/schains-vol-a: special device /dev/mapper/schains-vol--a does not exist.'  # noqa
+    assert classify(err, 'mount') == UNKNOWN
+    assert classify("ERROR: can't open /dev/mapper/schains-vol--a", 'mkfs.btrfs') == UNKNOWN
+    assert classify('umount: /mnt/schains-vol-a: not mounted.', 'umount') == NOT_FOUND
+    assert classify('  Volume group "schains" not found', 'lvs') == NOT_FOUND
+
+
+def test_backoff():
+    for _ in range(100):
+        assert 2 <= backoff(4, max_delay=8) <= 4
+        assert 4 <= backoff(64, max_delay=8) <= 8
+
+
+def test_next_delay():
+    timeouts = [1, 2, 4]
+    assert next_delay(EXISTS, 0, timeouts) is None
+    assert next_delay(NOT_FOUND, 0, timeouts) is None
+    assert 0.5 <= next_delay(BUSY, 0, timeouts) <= 1
+    assert 1 <= next_delay(UNKNOWN, 1, timeouts) <= 2
+    # no sleep after the last attempt
+    assert next_delay(LOCKED, 2, timeouts) is None
+
+
+def test_deadline():
+    assert remaining() is None
+    with deadline(1.5):
+        assert 0 < remaining() <= 1.5
+        assert next_delay(BUSY, 0, [1, 2]) is not None
+        assert next_delay(BUSY, 0, [4, 8]) is None
+    assert remaining() is None
+
+
+def test_run_cmd_fails_fast(tmp_path):
+    # errors are classified as not found only for lvm commands
+    lvs = tmp_path / 'lvs'
+    lvs.write_text('#!/bin/sh\necho "Volume group \\"vg\\" not found" >&2\nexit 5\n')
+    lvs.chmod(0o755)
+    cmd = [str(lvs)]
+    start = time.monotonic()
+    with pytest.raises(CommandError) as exc_info:
+        run_cmd(cmd, retries=3)
+    assert exc_info.value.error_class == NOT_FOUND
+    assert time.monotonic() - start < 1
+
+
+def test_run_cmd_retries_transient():
+    cmd = ['sh', '-c', 'echo "device is busy" >&2; exit 5']
+    with mock.patch('src.core.time.sleep') as sleep_mock:
+        with pytest.raises(CommandError) as exc_info:
+            run_cmd(cmd, retries=3)
+    assert exc_info.value.error_class == BUSY
+    assert sleep_mock.call_count == 2
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from src.shell import LvmShell, LvmShellError
+
+
+def test_return_code():
+    report = json.dumps({
+        'report': [{'lv': [{'lv_name': 'vol-a'}]}],
+        'log': [
+            {'log_seq_num': '1', 'log_type': 'status',
+             'log_object_type': 'cmd', 'log_ret_code': '1'}
+        ]
+    })
+    assert LvmShell._return_code(report) == 1
+    failed = json.dumps({
+        'log': [
+            {'log_seq_num': '1', 'log_type': 'error',
+             'log_object_type': 'lv', 'log_ret_code': '0'},
+            {'log_seq_num': '2', 'log_type': 'status',
+             'log_object_type': 'cmd', 'log_ret_code': '5'}
+        ]
+    })
+    assert LvmShell._return_code(failed) == 5
+    assert LvmShell._return_code('') is None
+
+
+def test_error_messages():
+    failed = json.dumps({
+        'log': [
+            {'log_seq_num': '1', 'log_type': 'error', 'log_object_type': 'lv',
+             'log_message': 'Logical Volume "vol-a" already exists'},
+            {'log_seq_num': '2', 'log_type': 'status',
+             'log_object_type': 'cmd', 'log_ret_code': '5'}
+        ]
+    })
+    assert LvmShell._error_messages(failed) == [
+        'Logical Volume "vol-a" already exists'
+    ]
+    assert LvmShell._error_messages('') == []
+
+
+def test_shell_not_available():
+    shell = LvmShell(binary='not-existing-lvm-binary')
+    with pytest.raises(LvmShellError):
+        shell.execute(['lvs'])
+    assert not shell.is_alive()
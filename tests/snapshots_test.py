@@ -0,0 +1,92 @@
+import os
+
+import mock
+import pytest
+
+from src.app import app
+from src.core import LvmPyError, create, mount, remove, unmount
+from src.snapshots import (
+    LVM,
+    SUBVOLUME,
+    Snapshot,
+    create_from_snapshot,
+    create_lvm_snapshot,
+    create_snapshot,
+    list_lvm_snapshots,
+    list_snapshots,
+    remove_snapshot
+)
+
+VOLUME = 'vol-snap'
+
+
+def test_create_lvm_snapshot(make_lv):
+    thin = make_lv(VOLUME, 'Vwi-a-tz--')
+    with mock.patch('src.snapshots.logical_volume', return_value=thin), \
+            mock.patch('src.snapshots.run_lvm') as run_mock, \
+            mock.patch('src.snapshots.VOLUME_GROUP', 'schains'):
+        create_lvm_snapshot(VOLUME, 'nightly')
+    run_mock.assert_called_once_with([
+        'lvcreate', '-s', '-ky', '-n', f'{VOLUME}+nightly', f'schains/{VOLUME}'
+    ])
+    # thick snapshots are active along with the mounted origin
+    thick = make_lv(VOLUME, '-wi-a-----')
+    with mock.patch('src.snapshots.logical_volume', return_value=thick), \
+            mock.patch('src.snapshots.run_lvm') as run_mock:
+        with pytest.raises(LvmPyError):
+            create_lvm_snapshot(VOLUME, 'nightly')
+    run_mock.assert_not_called()
+    with pytest.raises(LvmPyError):
+        create_lvm_snapshot(VOLUME, '../nightly')
+
+
+def test_list_lvm_snapshots(lvs_report):
+    output = lvs_report(
+        (VOLUME, 'Vwi-a-tz--'),
+        (f'{VOLUME}+nightly', 'Vwi---tz-k'),
+        (f'{VOLUME}-2+nightly', 'Vwi---tz-k'),
+        ('warm+268435456+abcd0123', '-wi-a-----')
+    )
+    with mock.patch('src.snapshots.run_lvm', return_value=output):
+        assert list_lvm_snapshots(VOLUME) == [Snapshot('nightly', VOLUME, LVM)]
+        assert list_lvm_snapshots('warm') == []
+
+
+def test_create_from_thick_snapshot(make_lv):
+    snapshot = make_lv(f'{VOLUME}+nightly', 'swi-a-s---')
+    with mock.patch('src.snapshots.logical_volume', return_value=snapshot):
+        with pytest.raises(LvmPyError):
+            create_from_snapshot('vol-copy', VOLUME, 'nightly')
+
+
+def test_subvolume_snapshots(vg):
+    create(VOLUME, '256m')
+    try:
+        mountpoint = mount(VOLUME, is_schain=False)
+        with open(os.path.join(mountpoint, 'data'), 'w') as data_file:
+            data_file.write('test')
+        create_snapshot(VOLUME, 'first', readonly=True)
+        snapshot_path = os.path.join(mountpoint, '.snapshots', 'first')
+        with open(os.path.join(snapshot_path, 'data')) as data_file:
+            assert data_file.read() == 'test'
+        unmount(VOLUME, is_schain=False)
+
+        # volume is mounted temporarily
+        assert Snapshot('first', VOLUME, SUBVOLUME) in list_snapshots(VOLUME)
+        remove_snapshot(VOLUME, 'first')
+        assert list_snapshots(VOLUME) == []
+    finally:
+        remove(VOLUME, is_schain=False)
+
+
+def test_snapshot_routes_errors():
+    client = app.test_client()
+    res = client.post('/VolumeDriver.Create', json={
+        'Name': 'vol-copy', 'Opts': {'from_snapshot': 'nightly'}
+    })
+    assert res.status_code == 400
+    with mock.patch('src.app.list_snapshots',
+                    side_effect=LvmPyError('No such volume')):
+        res = client.post('/Snapshot.List', json={'Name': 'vol-x'})
+    assert res.status_code == 400
+    assert res.get_json() == {'Err': 'No such volume'}
@@ -0,0 +1,90 @@
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import mock
+
+from src.supervisor import (
+    HealthSupervisor,
+    keepalive_interval,
+    probe,
+    sd_notify
+)
+
+
+def test_sd_notify(tmp_path):
+    address = str(tmp_path / 'notify.sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as server:
+        server.bind(address)
+        with mock.patch.dict(os.environ, {'NOTIFY_SOCKET': address}):
+            assert sd_notify('WATCHDOG=1') is True
+        assert server.recv(64) == b'WATCHDOG=1'
+    with mock.patch.dict(os.environ, {}, clear=True):
+        assert sd_notify('WATCHDOG=1') is False
+
+
+def test_probe():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200 if self.path == '/' else 500)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with mock.patch('src.supervisor.PORT', server.server_port):
+            assert probe('/') is True
+            assert probe('/broken') is False
+    finally:
+        server.shutdown()
+        server.server_close()
+    with mock.patch('src.supervisor.PORT', server.server_port):
+        assert probe('/', timeout=0.1) is False
+
+
+def test_supervisor_threshold():
+    s = HealthSupervisor(failure_threshold=2)
+    with mock.patch('src.supervisor.probe', return_value=False), \
+            mock.patch('src.supervisor.sd_notify') as notify_mock:
+        # failures before the first answer are left to systemd start timeout
+        assert s.check() is False
+        assert s.failures == 0
+        notify_mock.assert_not_called()
+
+    with mock.patch('src.supervisor.probe', return_value=True), \
+            mock.patch('src.supervisor.sd_notify') as notify_mock:
+        assert s.check() is True
+        assert s.ready
+        assert notify_mock.call_args_list == [
+            mock.call('READY=1'), mock.call('WATCHDOG=1')
+        ]
+
+    with mock.patch('src.supervisor.probe', return_value=False), \
+            mock.patch('src.supervisor.sd_notify') as notify_mock:
+        s.check()
+        notify_mock.assert_called_once_with('WATCHDOG=1')
+        notify_mock.reset_mock()
+        s.check()
+        assert s.failures == 2
+        notify_mock.assert_called_with('WATCHDOG=trigger')
+        notify_mock.reset_mock()
+        s.check()
+        notify_mock.assert_not_called()
+
+    with mock.patch('src.supervisor.probe', return_value=True), \
+            mock.patch('src.supervisor.sd_notify') as notify_mock:
+        assert s.check() is True
+        assert s.failures == 0
+        notify_mock.assert_called_once_with('WATCHDOG=1')
+
+
+def test_keepalive_interval():
+    with mock.patch.dict(os.environ, {'WATCHDOG_USEC': '60000000'}):
+        assert keepalive_interval(10) == 10
+        assert keepalive_interval(90) == 30
+    with mock.patch.dict(os.environ, {}, clear=True):
+        assert keepalive_interval(90) == 90
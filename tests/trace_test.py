@@ -0,0 +1,45 @@
+import mock
+
+from src.trace import CommandTracer
+
+
+def test_tracer_run():
+    tracer = CommandTracer(size=2, slow_threshold=60)
+    observer = mock.Mock()
+    tracer.subscribe(observer)
+    res = tracer.run(['sh', '-c', 'echo err >&2; exit 3'], attempt=1)
+    assert res.returncode == 3
+    trace = tracer.traces()[0]
+    assert trace.name == 'sh'
+    assert trace.returncode == 3
+    assert trace.stderr_size == 4
+    assert trace.attempt == 1
+    assert not trace.slow
+    observer.assert_called_once_with(trace)
+
+
+def test_tracer_ring_buffer():
+    tracer = CommandTracer(size=2, slow_threshold=1)
+    tracer.record(['lvs'], 0, 0.1, 0)
+    tracer.record(['lvcreate'], 0, 2, 0)
+    tracer.record(['mkfs.btrfs'], 0, 0.5, 0)
+    assert [t.name for t in tracer.traces()] == ['mkfs.btrfs', 'lvcreate']
+    assert [t.name for t in tracer.traces(slow=True)] == ['lvcreate']
+    assert len(tracer.traces(limit=1)) == 1
+
+
+def test_failed_observer():
+    tracer = CommandTracer()
+    tracer.subscribe(mock.Mock(side_effect=ValueError('Test error')))
+    trace = tracer.record(['lvs'], 0, 0.1, 0)
+    assert tracer.traces() == [trace]
+
+
+def test_last_lvm_command():
+    tracer = CommandTracer()
+    tracer.record(['mkfs.btrfs'], 10, 1, 0)
+    assert tracer.last_lvm_success is None
+    tracer.record(['lvs'], 20, 1, 0)
+    tracer.record(['lvm', 'lvcreate'], 30, 2, 5)
+    assert tracer.last_lvm_success == 21
+    assert tracer.last_lvm_failure == 32
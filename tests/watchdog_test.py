@@ -0,0 +1,34 @@
+import time
+
+import mock
+
+from src.core import LvmPyError
+from src.watchdog import VolumeGroupWatchdog
+
+
+def test_watchdog_trigger():
+    w = VolumeGroupWatchdog(group='test-vg', interval=3600)
+    with mock.patch('src.watchdog.ensure_volume_group') as ensure_mock:
+        w.start()
+        time.sleep(0.2)
+        # the first check runs right away
+        ensure_mock.assert_called_once_with(name='test-vg')
+        w.trigger()
+        time.sleep(0.2)
+        assert ensure_mock.call_count == 2
+        assert w.last_check is not None
+        w.stop()
+        w.join(timeout=1)
+    assert not w.is_alive()
+
+
+def test_watchdog_check_failed():
+    w = VolumeGroupWatchdog(group='test-vg')
+    with mock.patch('src.watchdog.ensure_volume_group',
+                    side_effect=LvmPyError('Test error')):
+        assert w.check() is False
+    assert isinstance(w.last_error, LvmPyError)
+    assert w.last_check is None
+    with mock.patch('src.watchdog.ensure_volume_group'):
+        assert w.check() is True
+    assert w.last_error is None
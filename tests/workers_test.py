@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from src.metrics import WORKER_QUEUE_DEPTH
+from src.retry import deadline, remaining
+from src.workers import QueueFullError, WorkerPool
+
+
+def test_run_parallel():
+    pool = WorkerPool(workers=4, queue_size=0, name='test-parallel')
+    start = time.monotonic()
+    futures = [pool.submit(time.sleep, 0.2) for _ in range(4)]
+    for future in futures:
+        future.result()
+    assert time.monotonic() - start < 0.6
+    assert pool.active == 0 and pool.queued == 0
+
+
+def test_back_pressure():
+    pool = WorkerPool(workers=1, queue_size=1, timeout=0.1, name='test-full')
+    release = threading.Event()
+    running = pool.submit(release.wait)
+    waiting = pool.submit(release.wait)
+    time.sleep(0.1)
+    assert pool.queued == 1
+    assert WORKER_QUEUE_DEPTH.value(pool='test-full') == 1
+    with pytest.raises(QueueFullError):
+        pool.submit(release.wait)
+    release.set()
+    running.result(), waiting.result()
+    assert pool.run(lambda: 'done') == 'done'
+
+
+def test_nested_submit():
+    pool = WorkerPool(workers=1, queue_size=0, timeout=0.1, name='test-nested')
+    assert pool.run(lambda: pool.run(lambda: 'nested')) == 'nested'
+    with pytest.raises(ValueError):
+        pool.run(lambda: pool.run(int, 'not a number'))
+
+
+def test_request_context():
+    pool = WorkerPool(workers=1, queue_size=0, name='test-context')
+    with deadline(60):
+        assert 0 < pool.run(remaining) <= 60
+    assert pool.run(remaining) is None